@@ -5,41 +5,30 @@ baggage_weight = None
 sleeper = 5
 
 def for_auto_create_passengers():
-    import sqlite3
     import time
-    from app import random_behavior, random_baggage_weight, current_time, user_logger
+    from app import clock, user_logger, repository, open_flights, insert_passengers, recount_passengers
+    from workload import ArrivalGenerator, WorkloadRunner, batch_profile
 
     last_delete_time = time.time()
 
-    while True:
-        conn = sqlite3.connect('passengers.db')  # noqa
-        c = conn.cursor()
-
-        try:
+    # В среднем num_passengers пассажиров за sleeper секунд модельного времени.
+    def insert(rows):
+        nonlocal last_delete_time
+        with repository.transaction():
             current_time_seconds = time.time()
             if current_time_seconds - last_delete_time >= delete_interval:
-                c.execute('DELETE FROM passengers') # noqa
-                c.execute('DELETE FROM flights') # noqa
-                conn.commit()
+                repository.clear()
+                open_flights.clear()
+                recount_passengers()
                 last_delete_time = current_time_seconds
                 print(f"{time.strftime('%H:%M:%S', time.localtime())} - Данные из таблиц passengers и flights удалены.")
 
-            for _ in range(num_passengers):  # noqa
-                current_behavior = behavior if behavior != 'Случайно' else random_behavior()
-                current_baggage_weight = baggage_weight if baggage_weight is not None else random_baggage_weight()
-                c.execute("INSERT INTO passengers (behavior, status, baggage_weight, action_time) VALUES (?, ?, ?, ?)",
-                          (current_behavior, 'Поиск билета', current_baggage_weight, current_time))
-            conn.commit()
-
-            user_logger.info(f"Пользователь сгенерировал {num_passengers} пассажиров с характеристиками: поведение - {behavior},"
-                            f" вес багажа - {baggage_weight if baggage_weight is not None else 'Случайно'}")
+            insert_passengers(rows)
 
-            print(f"{time.strftime('%H:%M:%S', time.localtime())} - Авто-генерация прошла успешно.")
+        user_logger.info(f"Пользователь сгенерировал {len(rows)} пассажиров с характеристиками: поведение - {behavior},"
+                        f" вес багажа - {baggage_weight if baggage_weight is not None else 'Случайно'}")
 
-        except sqlite3.OperationalError:
-            conn.rollback()
-            print(f"{time.strftime('%H:%M:%S', time.localtime())} - Произошла ошибка во время создания пассажиров.")
+        print(f"{time.strftime('%H:%M:%S', time.localtime())} - Авто-генерация прошла успешно.")
 
-        finally:
-            conn.close()
-            time.sleep(sleeper)
\ No newline at end of file
+    generator = ArrivalGenerator(batch_profile(num_passengers, sleeper, behavior, baggage_weight))
+    WorkloadRunner(generator, clock, insert).run()
\ No newline at end of file
@@ -1,12 +1,27 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, g, render_template, request, jsonify
+import json
+import os
 import sqlite3
-import random
 import threading
 import time
-import logging
-import requests
-from datetime import datetime, timedelta
+from collections import Counter
 from flask_swagger_ui import get_swaggerui_blueprint
+from db import migrate
+from generation import generate_passengers
+from storage import create_repository
+from scheduler import EventScheduler
+from outbound import OutboundClient
+from model_clock import ModelClock
+from flight_index import FlightIndex, flight_key
+from logs import get_logger, log_transitions
+from journal import TransitionJournal
+from statuses import Status
+from lifecycle import Event, PassengerLifecycle
+import metrics
+import rng
+from profiling import profiler, span, sample
+from workload import LOOKAHEAD, ArrivalGenerator, WorkloadRunner, batch_profile, parse_profile
+from model_time import table_to_epoch, from_epoch, manipulate_time
 
 app = Flask(__name__)
 
@@ -90,7 +105,7 @@ def swagger():
                 "post": {
                     "tags": ["Создание пассажиров"],
                     "summary": "Запуск авто-генерации пассажиров",
-                    "description": "Запускает автоматическую генерацию пассажиров с заданными параметрами.",
+                    "description": "Запускает генерацию прибытий пассажиров в модельном времени: пуассоновский поток с суточной кривой интенсивности, всплесками прибытий к рейсам, открытым для покупки билетов, и смесью поведений. Без profile в среднем num_passengers пассажиров прибывают за interval секунд модельного времени. Время первого действия пассажира - минута его прибытия, прибытия вставляются заранее окнами на lookahead минут.",
                     "requestBody": {
                         "required": True,
                         "content": {
@@ -104,7 +119,7 @@ def swagger():
                                         },
                                         "interval": {
                                             "type": "integer",
-                                            "description": "Интервал генерации пассажиров в секундах"
+                                            "description": "Интервал генерации пассажиров в секундах модельного времени"
                                         },
                                         "behavior": {
                                             "type": "string",
@@ -113,6 +128,17 @@ def swagger():
                                         "baggage_weight": {
                                             "type": "integer",
                                             "description": "Вес багажа"
+                                        },
+                                        "profile": {
+                                            "description": "Профиль нагрузки: название ('flat', 'airport') или объект с полями base, rate (прибытий в модельный час), diurnal (24 множителя по часам или 'airport'), behavior_mix ({поведение: вес}), baggage_weight, burst_per_seat, burst_size, burst_window (минуты)",
+                                            "oneOf": [
+                                                {"type": "string"},
+                                                {"type": "object"}
+                                            ]
+                                        },
+                                        "lookahead": {
+                                            "type": "integer",
+                                            "description": "Минуты модельного времени, на которые прибытия вставляются заранее"
                                         }
                                     }
                                 }
@@ -124,7 +150,7 @@ def swagger():
                             "description": "Авто-генерация успешно запущена."
                         },
                         "400": {
-                            "description": "Один из параметров не был заполнен."
+                            "description": "Один из параметров не был заполнен или профиль нагрузки задан неверно."
                         }
                     }
                 }
@@ -170,7 +196,7 @@ def swagger():
                     },
                     "responses": {
                         "200": {
-                            "description": "Покупка билета успешно обработана."
+                            "description": "Пакет обработан одной транзакцией, необработанные записи перечислены в поле failed."
                         },
                         "500": {
                             "description": "Ошибка сервера при покупке билета."
@@ -205,7 +231,7 @@ def swagger():
                     },
                     "responses": {
                         "200": {
-                            "description": "Возврат билета успешно обработан."
+                            "description": "Пакет обработан одной транзакцией, необработанные записи перечислены в поле failed."
                         },
                         "500": {
                             "description": "Ошибка сервера при возврате билета."
@@ -240,7 +266,7 @@ def swagger():
                     },
                     "responses": {
                         "200": {
-                            "description": "Регистрация успешно обработана."
+                            "description": "Пакет обработан одной транзакцией, необработанные записи перечислены в поле failed."
                         },
                         "500": {
                             "description": "Ошибка сервера при регистрации."
@@ -304,7 +330,7 @@ def swagger():
                     },
                     "responses": {
                         "200": {
-                            "description": "Посадка успешно обработана."
+                            "description": "Пакет обработан одной транзакцией, необработанные записи перечислены в поле failed."
                         },
                         "500": {
                             "description": "Ошибка сервера при посадке."
@@ -332,6 +358,14 @@ def swagger():
                                     "airplaneId": {
                                         "type": "string",
                                         "description": "Идентификатор самолета."
+                                    },
+                                    "airplaneType": {
+                                        "type": "string",
+                                        "description": "Тип самолета, по которому определяется вместимость, если не передан capacity."
+                                    },
+                                    "capacity": {
+                                        "type": "integer",
+                                        "description": "Число мест на рейсе. Пассажиры распределяются только на рейсы со свободными местами."
                                     }
                                 },
                                 "required": ["flightId", "airplaneId"]
@@ -342,6 +376,9 @@ def swagger():
                         "200": {
                             "description": "Рейс успешно добавлен и доступен для покупки билетов."
                         },
+                        "400": {
+                            "description": "Вместимость рейса не целое число или отрицательна."
+                        },
                         "500": {
                             "description": "Ошибка сервера при добавлении рейса."
                         }
@@ -413,186 +450,354 @@ def swagger():
                         }
                     }
                 }
+            },
+            "/passenger/time": {
+                "post": {
+                    "tags": ["Взаимодействие с табло"],
+                    "summary": "Передача модельного времени",
+                    "description": "Табло сообщает текущее модельное время (одну отметку или пакет отметок). Пока отметки приходят, модуль не опрашивает табло.",
+                    "requestBody": {
+                        "required": True,
+                        "content": {
+                            "application/json": {
+                                "schema": {
+                                    "oneOf": [
+                                        {
+                                            "type": "string",
+                                            "description": "Модельное время"
+                                        },
+                                        {
+                                            "type": "array",
+                                            "items": {
+                                                "type": "string"
+                                            },
+                                            "description": "Пакет отметок модельного времени в порядке их появления"
+                                        }
+                                    ]
+                                }
+                            }
+                        }
+                    },
+                    "responses": {
+                        "200": {
+                            "description": "Модельное время обновлено."
+                        },
+                        "400": {
+                            "description": "Некорректное модельное время."
+                        }
+                    }
+                }
+            },
+            "/metrics": {
+                "get": {
+                    "tags": ["Мониторинг"],
+                    "summary": "Метрики модуля",
+                    "description": "Метрики в текстовом формате Prometheus: число пассажиров по статусам, смены статусов, длительность тиков, отставание обработки, длительность исходящих запросов и транзакций SQLite, размеры пакетов ответов.",
+                    "responses": {
+                        "200": {
+                            "description": "Текущие значения метрик.",
+                            "content": {
+                                "text/plain": {
+                                    "schema": {
+                                        "type": "string"
+                                    }
+                                }
+                            }
+                        }
+                    }
+                }
+            },
+            "/debug/profile": {
+                "get": {
+                    "tags": ["Мониторинг"],
+                    "summary": "Профилирование горячего пути",
+                    "description": "Последние замеры участков тикера, обработки статусов и обработчиков запросов, а также агрегаты по участкам (число, сумма, максимум, p50, p90, p99 в секундах). Замеры ведутся при PASSENGER_PROFILING=1; PASSENGER_CPROFILE_DIR и PASSENGER_CPROFILE_RATE включают выборочные дампы cProfile.",
+                    "parameters": [
+                        {
+                            "name": "limit",
+                            "in": "query",
+                            "required": False,
+                            "description": "Число последних замеров в отчёте.",
+                            "schema": {
+                                "type": "integer"
+                            }
+                        }
+                    ],
+                    "responses": {
+                        "200": {
+                            "description": "Отчёт профилирования."
+                        }
+                    }
+                }
+            },
+            "/simulation/seed": {
+                "get": {
+                    "tags": ["Создание пассажиров"],
+                    "summary": "Текущее зерно симуляции",
+                    "description": "Возвращает зерно генераторов случайных чисел. null - недетерминированный режим.",
+                    "responses": {
+                        "200": {
+                            "description": "Текущее зерно."
+                        }
+                    }
+                },
+                "post": {
+                    "tags": ["Создание пассажиров"],
+                    "summary": "Задание зерна симуляции",
+                    "description": "Перезапускает потоки случайных чисел подсистем (поведение, багаж, выбор рейсов, вероятностные переходы, времена действий) с заданным зерном. С одинаковым зерном прогоны воспроизводимы. Начальное зерно задаётся переменной окружения PASSENGER_SEED.",
+                    "requestBody": {
+                        "required": True,
+                        "content": {
+                            "application/json": {
+                                "schema": {
+                                    "type": "object",
+                                    "properties": {
+                                        "seed": {
+                                            "type": "integer",
+                                            "nullable": True,
+                                            "description": "Зерно; null - случайное зерно из системного источника"
+                                        }
+                                    }
+                                }
+                            }
+                        }
+                    },
+                    "responses": {
+                        "200": {
+                            "description": "Зерно задано."
+                        },
+                        "400": {
+                            "description": "Зерно должно быть целым числом."
+                        }
+                    }
+                }
             }
         }
     }
     return jsonify(swagger_doc)
 
-# Логирование действий пассажиров.
-passenger_logger = logging.getLogger('passenger_actions')
-passenger_logger.setLevel(logging.INFO)
-handler = logging.FileHandler('passenger_actions.log', encoding='utf-8')
-handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))  # noqa
-passenger_logger.addHandler(handler)
-
-# Логирование действий пользователя.
-user_logger = logging.getLogger('user_actions')
-user_logger.setLevel(logging.INFO)
-handler = logging.FileHandler('user_actions.log', encoding='utf-8')
-handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))  # noqa
-user_logger.addHandler(handler)
-
-#
-flight_loger = logging.getLogger('flights_list')
-flight_loger.setLevel(logging.INFO)
-handler = logging.FileHandler('flights_list.log', encoding='utf-8')
-handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))  # noqa
-flight_loger.addHandler(handler)
-
-# Управление потоком авто-генерации.
-auto_generation_thread = None
-auto_generation_running = False
-
-table = '26.228.200.110:5555'  # IP табло.
-ticket_office = '26.109.26.0:5555'  # IP кассы.
-transport = '26.132.135.106:5555'  # IP службы транспорта.
+# Логирование действий пассажиров, пользователя и рейсов через общую очередь.
+passenger_logger = get_logger('passenger_actions', 'passenger_actions.log')
+user_logger = get_logger('user_actions', 'user_actions.log')
+flight_loger = get_logger('flights_list', 'flights_list.log')
+
+# Двоичный журнал переходов для воспроизведения и анализа прогонов.
+journal = TransitionJournal()
+
+# Авто-генерация: генератор прибытий по профилю нагрузки в модельном времени (None - выключена).
+auto_generation = None
+
+table = os.environ.get('PASSENGER_BOARD_HOST', '26.228.200.110:5555')  # IP табло.
+ticket_office = os.environ.get('PASSENGER_TICKET_OFFICE_HOST', '26.109.26.0:5555')  # IP кассы.
+transport = os.environ.get('PASSENGER_TRANSPORT_HOST', '26.132.135.106:5555')  # IP службы транспорта.
+ticker_enabled = os.environ.get('PASSENGER_TICKER', '1') != '0'  # '0' - тики выполняет внешний код через run_tick.
+
+# Выбор рейса с учётом весов индекса открытых рейсов (свободных мест) вместо равновероятного.
+weighted_flights = False
+
+# Вместимость рейса, если табло не передало capacity: по типу самолёта (airplaneType),
+# иначе default_capacity (None - без ограничения). Таблица задаётся конфигурацией:
+# PASSENGER_AIRPLANE_CAPACITIES='{"<тип самолёта>": <мест>}', PASSENGER_DEFAULT_CAPACITY=<мест>.
+airplane_capacities = json.loads(os.environ.get('PASSENGER_AIRPLANE_CAPACITIES', '{}'))
+default_capacity = int(os.environ['PASSENGER_DEFAULT_CAPACITY']) if os.environ.get('PASSENGER_DEFAULT_CAPACITY') else None
 
 # Временные параметры.
 time_period = 30
 check_time = 3
 action_await = 7
+response_timeout = 10  # Минуты модельного времени до повторной отправки пассажира без ответа.
+response_attempts = 5  # Число отправок, после которого пассажир без ответа покидает аэропорт.
 
-# Модельного время.
-current_time = ''
+# Модельное время: табло присылает его на /passenger/time, а если отметок не было дольше
+# check_time секунд, модуль сам опрашивает табло. Между синхронизациями clock.now()
+# экстраполирует время локально (None, пока табло не ответило).
+clock = ModelClock()
 
 
 def get_model_time():
-    global current_time
-
     try:
-        response = requests.get(f"http://{table}/dep-board/api/v1/time/now")  # noqa
+        response = outbound.get(f"http://{table}/dep-board/api/v1/time/now")
 
-        current_time = table_convert(response.text.strip())
-        print(f"{time.strftime("%H:%M:%S", time.localtime())} - Текущее модельное время: {current_time}")
+        model_ts = table_to_epoch(response.text)
+        clock.sync(model_ts)
+        print(f"{time.strftime("%H:%M:%S", time.localtime())} - Текущее модельное время: {from_epoch(model_ts)}")
 
     except Exception:  # noqa
         print(f"{time.strftime("%H:%M:%S", time.localtime())} - Модуль 'Табло' временно недоступен.")
 
 
-# Перевод времени в формат sqlite.
-def convert_to_sqlite_format(time_str):
-    dt_obj = datetime.strptime(time_str, "%m/%d/%Y %I:%M:%S %p")
+# Статусы, в которых пассажиры ждут ответа внешних модулей. Каждая отправка переносит время
+# действия на response_timeout минут вперёд, поэтому до ответа или таймаута пассажир не отправляется повторно.
+awaiting_statuses = (Status.BUYING, Status.RETURNING, Status.CHECKING_IN)
 
-    return dt_obj.strftime("%Y-%m-%d %H:%M:%S")
 
+# Запись о смене статуса пассажиров [(passenger_id, flight_id)] в двоичный журнал переходов
+# и, если log, в текстовый журнал действий пассажиров. Коды статусов переводятся в названия только для журнала.
+def record_transitions(old_status, new_status, passengers, model_ts, log=True):
+    passengers = list(passengers)
+    with span('record'):
+        journal.append(old_status, new_status, passengers, model_ts)
+        metrics.transitions_total.inc(len(passengers), old_status=Status(old_status).name,
+                                      new_status=Status(new_status).name)
+        count_passengers(old_status, -len(passengers))
+        count_passengers(new_status, len(passengers))
+        if log:
+            log_transitions(passenger_logger, Status(old_status).label, Status(new_status).label,
+                            [passenger_id for passenger_id, _ in passengers])
 
-def table_convert(time_str):
-    time_str = time_str.strip('"')
-    time_str = time_str.split('.')[0]
 
-    dt_obj = datetime.strptime(time_str, "%Y-%m-%dT%H:%M:%S")
+# Число пассажиров по статусам для метрик ведётся в процессе: вставки, переходы и удаления меняют
+# счётчики, а полный подсчёт по таблице выполняется только при старте и после очистки хранилища.
+def count_passengers(status, delta):
+    if delta:
+        metrics.passengers_by_status.inc(delta, status=Status(status).name)
 
-    return dt_obj.strftime("%Y-%m-%d %H:%M:%S")
 
+def recount_passengers():
+    metrics.passengers_by_status.replace(
+        {(Status(status).name,): count for status, count in repository.status_counts().items()})
 
-# Рандомизация поведения.
-def random_behavior():
-    behaviors = ['Обычный', 'Возврат', 'Мошенник касса', 'Мошенник регистрация', 'Опоздавший касса',
-                 'Опоздавший регистрация']
-    weights = [70, 10, 5, 5, 5, 5]
-    return random.choices(behaviors, weights=weights, k=1)[0]
 
+# Вставка новых пассажиров с учётом в счётчиках статусов. Возвращает id новых пассажиров.
+def insert_passengers(rows):
+    ids = repository.insert_passengers(rows)
+    for status, count in Counter(row[1] for row in rows).items():
+        count_passengers(status, count)
+    return ids
 
-# Рандомизация веса багажа.
-def random_baggage_weight():
-    return random.randint(0, 5)
 
+# Удаление всех пассажиров в статусе с учётом в счётчиках статусов. Возвращает рейсы удалённых пассажиров.
+def delete_passengers(status):
+    flight_ids = repository.delete_by_status(status)
+    count_passengers(status, -len(flight_ids))
+    return flight_ids
 
-# Обработка времени действия.
-def action_time_thread():
-    time.sleep(action_await)
-    while True:
-        get_model_time()
-        global current_time
-
-        if current_time != '':
-            conn = sqlite3.connect('passengers.db')
-            c = conn.cursor()
-            try:
-                with app.app_context():
-                    c.execute("UPDATE passengers set action_time = ? where action_time = ''", (current_time,))
-                    conn.commit()
-
-                    c.execute(
-                    "SELECT id, behavior, status, action_time, flight_id, baggage_weight FROM passengers WHERE "
-                    "strftime('%s', action_time) < strftime('%s', ?)",
-                    (current_time,))
-                    passengers = c.fetchall()
-                    passengers_by_status = {}
-                    for passenger in passengers:
-                        passenger_id, behavior, status, action_time, flight_id, baggage_weight = passenger
-                        if status not in passengers_by_status:
-                            passengers_by_status[status] = []
-                        passengers_by_status[status].append((passenger_id, behavior, flight_id, baggage_weight))
-
-                    for status, passenger_group in passengers_by_status.items():
-                        update_passenger_status(status, passenger_group, current_time)
-
-                    conn.commit()
-            except sqlite3.OperationalError:
-                print(f'{time.strftime("%H:%M:%S", time.localtime())} - Произошла ошибка при поиске активных пассажиров.')
-            finally:
-                conn.close()
-        time.sleep(check_time)
 
+# Освобождение мест пассажиров, покинувших свои рейсы: счётчик в хранилище и индекс открытых рейсов.
+def release_seats(flight_ids):
+    counts = Counter(flight_key(flight_id) for flight_id in flight_ids if flight_id is not None)
+    if not counts:
+        return
 
-# Функция для обновления статуса группы пассажиров
-def update_passenger_status(status, passenger_group, model_time):
-    if status == "Поиск билета":
-        conn = sqlite3.connect('passengers.db')
-        c = conn.cursor()
+    repository.change_occupancy({flight_id: -count for flight_id, count in counts.items()})
+    for flight_id, count in counts.items():
+        open_flights.release(flight_id, count)
 
-        try:
-            c.execute("SELECT EXISTS (SELECT 1 FROM flights WHERE is_check_in = '0');")
-            result = c.fetchone()[0]
-
-            if result == 1:
-                c.execute(
-                    "SELECT id, behavior FROM passengers WHERE strftime('%s', action_time) < strftime('%s', ?)"
-                    " AND status = 'Поиск билета'",
-                    (current_time,)
-                )
-                passengers_start = c.fetchall()
-
-                for passenger_id, passenger_behavior in passengers_start:
-                    c.execute("SELECT flight_id FROM flights ORDER BY RANDOM() LIMIT 1;")
-                    flight_id = c.fetchone()
-                    if passenger_behavior == "Мошенник касса":
-                        status = 'Возврат билета'
-                        model_time = random_time(current_time, manipulate_time(current_time, '+', time_period))
-                    elif passenger_behavior == 'Мошенник регистрация':
-                        status = 'Ожидание регистрации'
-                        model_time = current_time
-                    elif passenger_behavior == 'Опоздавший касса':
-                        status = 'Ожидание покупки билета'
-                        model_time = random_time(current_time, manipulate_time(current_time, '+', time_period))
-                    else:
-                        status = 'Покупка билета'
-                        model_time = random_time(current_time, manipulate_time(current_time, '+', time_period))
-                    c.execute(
-                        "UPDATE passengers SET status = ?, action_time = ?, flight_id = ? WHERE id = ?",
-                        (status, model_time, flight_id[0], passenger_id))
-
-                    passenger_logger.info(
-                        f"Пассажир {passenger_id} изменил свой статус с 'Поиск билета' на '{status}'.")
-                    conn.commit()
-            else:
-                c.execute("delete from passengers where status = 'Поиск билета'")
-                deleted = c.rowcount
-                passenger_logger.info(f"{deleted} людей покинуло аэропорт ввиду отсутствия доступных рейсов.")
-                conn.commit()
 
-        except Exception as e:
-            conn.rollback()
-            print(
-                f"{time.strftime("%H:%M:%S", time.localtime())} - Произошла ошибка во время отбора рейсов для пассажиров.")
-            return jsonify({"error": str(e)}), 500
+# Отметка об отправке групп {статус: группа пассажиров}. Возвращает группы к отправке
+# без пассажиров, исчерпавших response_attempts попыток: они переводятся в 'Удаление'.
+def begin_awaiting(groups, now_ts):
+    retry_ts = manipulate_time(now_ts, '+', response_timeout)
+    to_send = {}
+    expired = []
+
+    with repository.transaction():
+        for status, passenger_group in groups.items():
+            attempts = repository.mark_awaiting(status, [passenger[0] for passenger in passenger_group], retry_ts)
+            for passenger in passenger_group:
+                if passenger[0] not in attempts:
+                    continue
+                if attempts[passenger[0]] > response_attempts:
+                    expired.append((passenger[0], passenger[1], status, passenger[2]))
+                else:
+                    to_send.setdefault(status, []).append(passenger)
+        outcome = lifecycle.apply(Event.RESPONSE_TIMEOUT, expired, now_ts)
+
+    lifecycle.record_outcome(outcome, now_ts)
+    return to_send
+
+
+# Имена участков профилирования для обработки статусов.
+status_spans = {status: f"status.{status.name}" for status in Status}
+
+
+# Обработка событий планировщика, наступивших к модельному времени now_ts.
+def dispatch_due(now_ts):
+    passenger_ids = scheduler.pop_due()
+    if not passenger_ids:
+        return
+
+    with span('dispatch.load'):
+        passengers = repository.passengers(passenger_ids)
+
+    passengers_by_status = {}
+    later = []
+    with span('dispatch.group'):
+        for passenger in passengers:
+            passenger_id, behavior, status, action_ts, flight_id, baggage_weight = passenger
+            # Событие могло устареть: время действия перенесено или ещё не назначено.
+            if action_ts is None or action_ts > now_ts:
+                if action_ts is not None:
+                    later.append((action_ts, passenger_id))
+                continue
+            metrics.dispatch_lag_seconds.observe(now_ts - action_ts)
+            if status not in passengers_by_status:
+                passengers_by_status[status] = []
+            passengers_by_status[status].append((passenger_id, behavior, flight_id, baggage_weight))
+        scheduler.push(later)
+
+    # Пакеты к кассе и регистрации отправляются одновременно, остальные статусы обрабатываются локально.
+    outbound_groups = {}
+    for status, passenger_group in passengers_by_status.items():
+        if status in awaiting_statuses:
+            outbound_groups[status] = passenger_group
+        else:
+            with span(status_spans.get(status, 'status')):
+                update_passenger_status(status, passenger_group, now_ts)
+    if outbound_groups:
+        with span('dispatch.mark_awaiting'):
+            to_send = begin_awaiting(outbound_groups, now_ts)
+        with span('dispatch.outbound'):
+            send_outbound(to_send)
+
+
+# Один проход тикера: обработка событий, наступивших к модельному времени now_ts.
+def run_tick(now_ts):
+    started = time.perf_counter()
+    try:
+        with app.app_context(), sample('tick'), span('tick'):
+            with span('tick.advance'):
+                scheduler.advance(now_ts)
+            with span('tick.schedule_unset'):
+                repository.schedule_unset(now_ts)
+            dispatch_due(now_ts)
+    except sqlite3.OperationalError as e:
+        print(f'{time.strftime("%H:%M:%S", time.localtime())} - Произошла ошибка при поиске активных пассажиров: {e}')
+    metrics.tick_seconds.observe(time.perf_counter() - started)
 
-        finally:
-            conn.close()
 
-    elif status == "Покупка билета":
-        ticket_data = [ # noqa
+# Обработка времени действия: тикер спит ровно до наступления ближайшего события по часам модели,
+# до пробуждения планировщика (новое событие от хранилища или отметка времени от табло)
+# или до очередного опроса табло.
+def action_time_thread():
+    time.sleep(action_await)
+    scheduler.push(repository.scheduled())
+    next_poll = 0
+    while True:
+        age = clock.age()
+        if age is not None and age < check_time:
+            # Табло присылает время само: опрос нужен, только если отметки перестанут приходить.
+            next_poll = time.monotonic() + check_time - age
+        elif time.monotonic() >= next_poll:
+            with span('tick.clock'):
+                get_model_time()
+            next_poll = time.monotonic() + check_time
+
+        now_ts = clock.now()
+        if now_ts is not None:
+            run_tick(now_ts)
+
+        timeout = next_poll - time.monotonic()
+        delay = clock.wall_delay(scheduler.next_due())
+        if delay is not None:
+            timeout = min(timeout, delay)
+        scheduler.wait(max(timeout, 0))
+
+
+# Запрос к внешнему модулю для группы пассажиров: адрес, тело и сообщение при недоступности модуля.
+def outbound_request(status, passenger_group):
+    if status == Status.BUYING:
+        ticket_data = [
             {
                 "passenger_id": passenger[0],
                 "flight_id": passenger[2],
@@ -600,13 +805,11 @@ def update_passenger_status(status, passenger_group, model_time):
             }
             for passenger in passenger_group
         ]
-        try:
-            _ = requests.post(f"http://{ticket_office}/ticket-office/buy-ticket", json=ticket_data)  # noqa
-        except Exception: # noqa
-            print(f"{time.strftime("%H:%M:%S", time.localtime())} - Модуль 'Касса' недоступен для покупки билетов.")
+        return (f"http://{ticket_office}/ticket-office/buy-ticket", ticket_data,
+                "Модуль 'Касса' недоступен для покупки билетов.")
 
-    elif status == "Возврат билета":
-        return_data = [ # noqa
+    elif status == Status.RETURNING:
+        return_data = [
             {
                 "passenger_id": passenger[0],
                 "flight_id": passenger[2],
@@ -614,127 +817,150 @@ def update_passenger_status(status, passenger_group, model_time):
             }
             for passenger in passenger_group
         ]
-        try:
-            _ = requests.post(f"http://{ticket_office}/ticket-office/return-ticket", json=return_data)  # noqa
-        except Exception: # noqa
-            print(f"{time.strftime("%H:%M:%S", time.localtime())} - Модуль 'Касса' недоступен для возврата билетов.")
+        return (f"http://{ticket_office}/ticket-office/return-ticket", return_data,
+                "Модуль 'Касса' недоступен для возврата билетов.")
 
-    elif status == "Регистрация":
-        passenger_ids = [
-            {
-                "passenger_id": passenger[0],
-                "flight_id": passenger[2]
-            }
-            for passenger in passenger_group
-        ]
+    passenger_ids = [
+        {
+            "passenger_id": passenger[0],
+            "flight_id": passenger[2]
+        }
+        for passenger in passenger_group
+    ]
+    return (f"http://{ticket_office}/checkin/passenger", passenger_ids,
+            "Модуль 'Регистрация' недоступен для регистрации пассажиров.")
+
+
+# Одновременная отправка пакетов {статус: группа пассажиров} внешним модулям.
+def send_outbound(groups):
+    if not groups:
+        return
+
+    batches = [outbound_request(status, passenger_group) for status, passenger_group in groups.items()]
+    results = outbound.post_many([(url, payload) for url, payload, _ in batches])
+    for (_, _, error), chunk_results in zip(batches, results):
+        failed = sum(isinstance(result, Exception) for result in chunk_results)
+        if failed:
+            print(f"{time.strftime("%H:%M:%S", time.localtime())} - {error} "
+                  f"Не отправлено частей пакета: {failed} из {len(chunk_results)}.")
+
+
+# Функция для обновления статуса группы пассажиров
+def update_passenger_status(status, passenger_group, model_time):
+    if status == Status.SEARCHING:
+        chosen_flights = []
         try:
-            _ = requests.post(f"http://{ticket_office}/checkin/passenger", json=passenger_ids)  # noqa
-        except Exception: # noqa
+            with repository.transaction():
+                # Рейсы для всей группы выбираются одним пакетом и только со свободными местами:
+                # пассажирам, которым мест не хватило, рейсов нет. Дальнейший статус и время действия
+                # определяет таблица переходов по поведению пассажира. Событие применяется только к
+                # наступившей группе: прибытия, вставленные заранее, ждут своей минуты.
+                chosen_flights = open_flights.assign(len(passenger_group), weighted_flights)
+                if chosen_flights:
+                    repository.change_occupancy(Counter(chosen_flights))
+
+                seated = [(passenger[0], passenger[1], status, flight_id)
+                          for passenger, flight_id in zip(passenger_group, chosen_flights)]
+                left = [(passenger[0], passenger[1], status, None)
+                        for passenger in passenger_group[len(chosen_flights):]]
+                outcomes = []
+                if seated:
+                    outcomes.append(lifecycle.apply(Event.SEAT_ASSIGNED, seated, model_time))
+                if left:
+                    outcomes.append(lifecycle.apply(Event.NO_SEAT, left, model_time))
+                deleted = len(left) or None
+
+        except Exception as e:
+            # Транзакция откатилась: места, занятые в индексе, возвращаются.
+            for flight_id in chosen_flights:
+                open_flights.release(flight_id)
             print(
-                f"{time.strftime("%H:%M:%S", time.localtime())} - Модуль 'Регистрация' недоступен для регистрации пассажиров.")
+                f"{time.strftime("%H:%M:%S", time.localtime())} - Произошла ошибка во время отбора рейсов для пассажиров.")
+            return jsonify({"error": str(e)}), 500
+
+        for outcome in outcomes:
+            lifecycle.record_outcome(outcome, model_time)
+        if deleted is not None:
+            passenger_logger.info(f"{deleted} людей покинуло аэропорт ввиду отсутствия доступных рейсов.")
+
+    elif status in awaiting_statuses:
+        send_outbound(begin_awaiting({status: passenger_group}, model_time))
 
-    elif status == "На борту":
-        conn = sqlite3.connect('passengers.db')
-        c = conn.cursor()
+    elif status == Status.ON_BOARD:
         try:
-            for passenger in passenger_group:
-                passenger_id, behavior, flight_id, baggage_weight = passenger
-                c.execute("UPDATE passengers SET status = ?, action_time = ? WHERE id = ?",
-                          ("Удаление", model_time, passenger_id))
-            conn.commit()
+            outcome = lifecycle.apply(Event.DEPARTED, [(passenger[0], passenger[1], status, passenger[2])
+                                                       for passenger in passenger_group], model_time)
+            lifecycle.record_outcome(outcome, model_time)
         except sqlite3.OperationalError:
-            conn.rollback()
             print(
                 f"{time.strftime("%H:%M:%S", time.localtime())} - Произошла ошибка при изменении статуса с 'На борту' на 'Удаление'.")
-        finally:
-            conn.close()
 
-    elif status == "Удаление":
-        conn = sqlite3.connect('passengers.db')
-        c = conn.cursor()
+    elif status == Status.LEAVING:
         try:
-            c.execute("DELETE from passengers WHERE status like 'Удаление'")
-            deleted_rows = c.rowcount
+            # Места покидающих пассажиров уже освобождены переходом в 'Удаление'.
+            deleted_rows = len(delete_passengers(Status.LEAVING))
             passenger_logger.info(f"Аэропорт покинуло {deleted_rows} человек.")
-            conn.commit()
         except sqlite3.OperationalError:
-            conn.rollback()
             print(f'{time.strftime("%H:%M:%S", time.localtime())} - Произошла ошибка при удалении пассажиров.')
-        finally:
-            conn.close()
 
 
-# Авто-генерация пассажиров.
-def auto_generate_passengers(num_passengers, interval, behavior, baggage_weight):
-    global auto_generation_running
-    while auto_generation_running:
-        conn = sqlite3.connect('passengers.db')  # noqa
-        c = conn.cursor()
+# Миграция схемы базы, выбор хранилища и обработка времени действия.
+migrate()
+repository = create_repository()
+scheduler = EventScheduler()
+outbound = OutboundClient()
+repository.on_schedule = scheduler.push
+open_flights = FlightIndex()
+lifecycle = PassengerLifecycle(repository, release_seats, record_transitions, time_period)
+recount_passengers()
+for open_flight_id, capacity, occupied in repository.open_flights():
+    open_flights.add(open_flight_id, free=None if capacity is None else capacity - occupied)
+if ticker_enabled:
+    threading.Thread(target=action_time_thread, daemon=True).start()
+
+# Замер и выборочное профилирование обработчиков запросов. Без профилирования хуки не регистрируются.
+if profiler.enabled or profiler.cprofile_dir:
+    @app.before_request
+    def profile_request_start():
+        g.profile_started = (time.time(), time.perf_counter())
+        g.profile_sample = sample(f"route.{request.endpoint}")
+        g.profile_sample.__enter__()
+
+    @app.teardown_request
+    def profile_request_end(error):
+        sampled = g.pop('profile_sample', None)
+        if sampled is not None:
+            sampled.__exit__(None, None, None)
+        if profiler.enabled and 'profile_started' in g:
+            started, start = g.pop('profile_started')
+            profiler.record(f"route.{request.endpoint}", started, time.perf_counter() - start)
+
+
+@app.route('/debug/profile')
+def debug_profile():
+    limit = request.args.get('limit', type=int)
+    return jsonify(profiler.report(limit)), 200
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+# Зерно симуляции: с одинаковым зерном поведение, багаж, выбор рейсов, вероятностные переходы
+# и времена действий повторяются от прогона к прогону. Смена зерна перезапускает все потоки.
+@app.route('/simulation/seed', methods=['GET', 'POST'])
+def simulation_seed():
+    if request.method == 'POST':
         try:
-            if behavior == 'Все': # noqa
-                behaviors = ['Обычный', 'Возврат', 'Мошенник касса', 'Мошенник регистрация', 'Опоздавший касса',
-                             'Опоздавший регистрация']
-
-                for b in behaviors:
-                    for _ in range(num_passengers):
-                        current_baggage_weight = baggage_weight if baggage_weight is not None else random_baggage_weight()
-                        c.execute(
-                            "INSERT INTO passengers (behavior, status, baggage_weight, action_time) VALUES (?, ?, ?, ?)",
-                            (b, 'Поиск билета', current_baggage_weight, current_time)
-                        )
-            else:
-                for _ in range(num_passengers):
-                    current_behavior = behavior if behavior != 'Случайно' else random_behavior()
-                    current_baggage_weight = baggage_weight if baggage_weight is not None else random_baggage_weight()
-                    c.execute(
-                        "INSERT INTO passengers (behavior, status, baggage_weight, action_time) VALUES (?, ?, ?, ?)",
-                        (current_behavior, 'Поиск билета', current_baggage_weight, current_time)
-                    )
-
-            conn.commit()
-        except sqlite3.OperationalError:
-            conn.rollback()
-            print(
-                f"{time.strftime('%H:%M:%S', time.localtime())} - Произошла ошибка во время авто-генерации пассажиров.")
-        finally:
-            conn.close()
-            time.sleep(interval)
-
-
-# Вычисление времени действия пассажиров.
-def random_time(start, end):
-    start_time = datetime.strptime(start, "%Y-%m-%d %H:%M:%S")
-    end_time = datetime.strptime(end, "%Y-%m-%d %H:%M:%S")
-
-    if end_time < start_time:
-        day_difference = (end_time - start_time).days
-        end_time += timedelta(days=abs(day_difference))
-
-    time_difference = (end_time - start_time).total_seconds() / 60
-
-    random_minutes = random.randint(0, int(time_difference) - 1)
-
-    result = start_time + timedelta(minutes=random_minutes)
-
-    return result.strftime("%Y-%m-%d %H:%M:%S")
+            seed = rng.parse_seed((request.json or {}).get('seed'))
+        except (TypeError, ValueError):
+            return jsonify({"error": "Зерно должно быть целым числом."}), 400
+        rng.reseed(seed)
+        user_logger.info(f"Пользователь задал зерно симуляции: {seed if seed is not None else 'случайное'}.")
+    return jsonify({"seed": rng.streams.seed}), 200
 
 
-# Вычисление границ временного действия.
-def manipulate_time(time_str, operator, minutes):
-    time_obj = datetime.strptime(time_str, "%Y-%m-%d %H:%M:%S")
-
-    new_time = ''
-    if operator == '+':
-        new_time = time_obj + timedelta(minutes=minutes)
-    elif operator == '-':
-        new_time = time_obj - timedelta(minutes=minutes)
-
-    return new_time.strftime("%Y-%m-%d %H:%M:%S")
-
-
-# Обработка времени действия.
-threading.Thread(target=action_time_thread, daemon=True).start()
-
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -749,33 +975,9 @@ def create_passengers():
     if not num_passengers:
         return jsonify({"error": "Один из параметров не был заполнен."}), 400
 
-    conn = sqlite3.connect('passengers.db')  # noqa
-    c = conn.cursor()
     try:
-        if behavior == 'Все': # noqa
-            # Список всех возможных типов поведения
-            behaviors = ['Обычный', 'Возврат', 'Мошенник касса', 'Мошенник регистрация', 'Опоздавший касса',
-                         'Опоздавший регистрация']
-
-            # Создаем num_passengers пассажиров для каждого типа поведения
-            for b in behaviors:
-                for _ in range(num_passengers):
-                    current_baggage_weight = baggage_weight if baggage_weight is not None else random_baggage_weight()
-                    c.execute(
-                        "INSERT INTO passengers (behavior, status, baggage_weight, action_time) VALUES (?, ?, ?, ?)",
-                        (b, 'Поиск билета', current_baggage_weight, current_time)
-                    )
-        else:
-            # Создаем пассажиров с указанным поведением
-            for _ in range(num_passengers):
-                current_behavior = behavior if behavior != 'Случайно' else random_behavior()
-                current_baggage_weight = baggage_weight if baggage_weight is not None else random_baggage_weight()
-                c.execute(
-                    "INSERT INTO passengers (behavior, status, baggage_weight, action_time) VALUES (?, ?, ?, ?)",
-                    (current_behavior, 'Поиск билета', current_baggage_weight, current_time)
-                )
-
-        conn.commit()
+        # При поведении 'Все' создается num_passengers пассажиров каждого типа.
+        insert_passengers(generate_passengers(num_passengers, behavior, baggage_weight, clock.now()))
 
         user_logger.info(
             f"Пользователь сгенерировал {num_passengers * 6 if behavior == 'Все' else num_passengers} "
@@ -787,54 +989,61 @@ def create_passengers():
                            "message": f"Успешно было создано {num_passengers * 6 if behavior == 'Все' else num_passengers} пассажиров."}), 200
 
     except sqlite3.OperationalError as e:
-        conn.rollback()
         print(f"{time.strftime('%H:%M:%S', time.localtime())} - Произошла ошибка во время создания пассажиров.")
         return jsonify({"error": str(e)}), 500
-    finally:
-        conn.close()
 
 
 @app.route('/start_auto_generation', methods=['POST'])
 def start_auto_generation():
-    global auto_generation_thread, auto_generation_running
+    global auto_generation
 
-    data = request.json
-    num_passengers = int(data.get('num_passengers'))
-    interval = int(data.get('interval'))
+    data = request.json or {}
+    num_passengers = data.get('num_passengers')
+    interval = data.get('interval')
     behavior = data.get('behavior')
     baggage_weight = data.get('baggage_weight')
 
-    if not num_passengers or not interval:
-        return jsonify({"error": "Один из параметров не был заполнен."}), 400
-
-    if auto_generation_thread:
-        auto_generation_running = False
-        auto_generation_thread.join()  # noqa
-
-    auto_generation_running = True
-    auto_generation_thread = threading.Thread(target=auto_generate_passengers,
-                                              args=(num_passengers, interval, behavior, baggage_weight), daemon=True)
-    auto_generation_thread.start()
+    # Профиль нагрузки задаётся явно, иначе num_passengers пассажиров в среднем за interval модельных секунд.
+    try:
+        if data.get('profile') is not None:
+            profile = parse_profile(data['profile'])
+        else:
+            if not num_passengers or not interval:
+                return jsonify({"error": "Один из параметров не был заполнен."}), 400
+            profile = batch_profile(int(num_passengers), int(interval), behavior, baggage_weight)
+        generator = ArrivalGenerator(profile)
+        lookahead = int(data.get('lookahead', LOOKAHEAD))
+    except (AttributeError, TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Новый генератор продолжает с окна прежнего: уже вставленные прибытия не дублируются.
+    horizon = None
+    if auto_generation:
+        auto_generation.stop()
+        horizon = auto_generation.horizon
+    auto_generation = WorkloadRunner(generator, clock, insert_passengers, lookahead, horizon=horizon).start()
 
     user_logger.info(
-        f"Пользователь включил авто-генерацию пассажиров со следующими параметрами: число генерируемых пассажиров - {num_passengers},"
-        f" интервал генераций - {interval}, поведение - {behavior}, вес багажа - {baggage_weight if baggage_weight is not None else 'Случайно'}")
+        f"Пользователь включил авто-генерацию пассажиров со следующими параметрами: прибытий в час - {profile.rate:g},"
+        f" профиль - {data.get('profile') or 'равномерный'}, поведение - {behavior},"
+        f" вес багажа - {profile.baggage_weight if profile.baggage_weight is not None else 'Случайно'}")
 
     return jsonify({
         "message": "Была запущена авто-генерация.",
         "num_passengers": num_passengers,
         "interval": interval,
+        "rate": profile.rate,
+        "lookahead": auto_generation.lookahead,
     }), 200
 
 
 @app.route('/stop_auto_generation', methods=['POST'])
 def stop_auto_generation():
-    global auto_generation_thread, auto_generation_running
+    global auto_generation
 
-    if auto_generation_thread:
-        auto_generation_running = False
-        auto_generation_thread.join()  # noqa
-        auto_generation_thread = None
+    if auto_generation:
+        auto_generation.stop()
+        auto_generation = None
 
     user_logger.info(f"Пользователь отключил авто-генерацию пассажиров.")
     return jsonify({"message": "Авто-генерация остановлена."}), 200
@@ -845,279 +1054,304 @@ def available_flights():
     data = request.json
     flight_id = data.get('flightId')
     airplane_id = data.get('airplaneId')
+    capacity = data.get('capacity', airplane_capacities.get(data.get('airplaneType'), default_capacity))
+    if capacity is not None:
+        try:
+            capacity = int(capacity)
+        except (TypeError, ValueError):
+            return jsonify({"error": "Вместимость рейса должна быть целым числом."}), 400
+        if capacity < 0:
+            return jsonify({"error": "Вместимость рейса не может быть отрицательной."}), 400
 
-    conn = sqlite3.connect('passengers.db')
-    c = conn.cursor()
-
+    added = False
     try:
-        c.execute('insert into flights (flight_id, airplane_id, is_check_in) VALUES (?, ?, 0)',
-                  (flight_id, airplane_id,))
-        flight_loger.info(f"Рейс №{flight_id} стал доступен для покупки билетов.")
-        conn.commit()
-    except sqlite3.IntegrityError as e:
-        conn.rollback()
+        # Рейс попадает в индекс до фиксации: при ошибке индекса запись рейса откатывается,
+        # а при ошибке фиксации рейс убирается из индекса.
+        with repository.transaction():
+            repository.add_flight(flight_id, airplane_id, capacity)
+            open_flights.add(flight_id, free=capacity)
+            added = True
+    except Exception as e:
+        if added:
+            open_flights.remove(flight_id)
         print(f"{time.strftime("%H:%M:%S", time.localtime())} - Произошла ошибка во время появления нового рейса.")
 
         return jsonify({"error": str(e)}), 500
-    finally:
-        conn.close()
+
+    if auto_generation:
+        auto_generation.generator.flight_opened(clock.now(), capacity)  # Всплеск прибытий к рейсу.
+    flight_loger.info(f"Рейс №{flight_id} стал доступен для покупки билетов.")
     return jsonify(), 200
 
 
 @app.route('/passenger/check-in/start/<int:flightId>', methods=['POST'])
 def check_in_start(flightId):  # noqa
-    check_in_end_time = table_convert(request.json)
-
-    conn = sqlite3.connect('passengers.db')
-    c = conn.cursor()
+    check_in_end_ts = table_to_epoch(request.json)
 
     try:
-        c.execute('update flights set is_check_in=1, check_in_end_time = ? where flight_id=?',
-                  (check_in_end_time, flightId))
-        flight_loger.info(f"Началась регистрация на рейс №{flightId}.")
-
-        c.execute("SELECT id FROM passengers WHERE flight_id = ? and status = 'Ожидание регистрации' and behavior != 'Опоздавший регистрация'", (flightId,))
-        rows = c.fetchall()
-
-        for row in rows:
-            passenger_id = row[0]
-            random_action_time = random_time(current_time, check_in_end_time)
-            c.execute("""
-                UPDATE passengers 
-                SET check_in_end_time = ?, 
-                    action_time = ?, 
-                    status = 'Регистрация' 
-                WHERE id = ?
-            """, (check_in_end_time, random_action_time, passenger_id))
-
-        c.execute("update passengers set status = 'Покупка билета' where flight_id=? and status = 'Ожидание покупки билета'",
-                  (flightId,))
-        conn.commit()
+        with repository.transaction():
+            repository.start_check_in(flightId, check_in_end_ts)
+            flight_loger.info(f"Началась регистрация на рейс №{flightId}.")
+
+            # Ожидающие регистрации (кроме опоздавших на неё) и опоздавшие к покупке билета.
+            passengers = [(passenger[0], passenger[1], passenger[2], passenger[4])
+                          for status in (Status.WAITING_CHECK_IN, Status.WAITING_PURCHASE)
+                          for passenger in repository.flight_passengers(flightId, status)]
+            outcome = lifecycle.apply(Event.CHECK_IN_OPENED, passengers, clock.now(), check_in_end_ts=check_in_end_ts)
+        open_flights.remove(flightId)
+        lifecycle.record_outcome(outcome, clock.now())
     except sqlite3.IntegrityError as e:
-        conn.rollback()
         print(
             f"{time.strftime("%H:%M:%S", time.localtime())} - Произошла ошибка во время начала регистрации на рейс {flightId}.")
 
         return jsonify({"error": str(e)}), 500
-    finally:
-        conn.close()
     return jsonify(), 200
 
 
 @app.route('/passenger/check-in/end/<int:flightId>', methods=['POST'])
 def check_in_end(flightId):  # noqa
-    conn = sqlite3.connect('passengers.db')
-    c = conn.cursor()
-
     try:
-        c.execute('delete from flights where flight_id = ?', (flightId,))
-        flight_loger.info(f"Закончилась регистрация на рейс №{flightId}.")
-
-        c.execute("update passengers set status='Регистрация' where flight_id=? and status = 'Ожидание регистрации'", (flightId,))
-        conn.commit()
+        with repository.transaction():
+            repository.remove_flight(flightId)
+            flight_loger.info(f"Закончилась регистрация на рейс №{flightId}.")
+
+            waiting = [(passenger[0], passenger[1], passenger[2], passenger[4])
+                       for passenger in repository.flight_passengers(flightId, Status.WAITING_CHECK_IN)]
+            outcome = lifecycle.apply(Event.CHECK_IN_CLOSED, waiting, clock.now())
+        open_flights.remove(flightId)
+        lifecycle.record_outcome(outcome, clock.now())
     except sqlite3.IntegrityError as e:
-        conn.rollback()
         print(
             f"{time.strftime("%H:%M:%S", time.localtime())} - Произошла ошибка во время закрытия регистрации на рейс {flightId}.")
 
         return jsonify({"error": str(e)}), 500
-    finally:
-        conn.close()
     return jsonify(), 200
 
 
+# Отметки модельного времени от табло: строка или пакет строк в порядке появления.
+@app.route('/passenger/time', methods=['POST'])
+def model_time_push():
+    data = request.json
+    ticks = data if isinstance(data, list) else [data]
+
+    try:
+        timestamps = [table_to_epoch(tick) for tick in ticks]
+    except (AttributeError, TypeError, ValueError) as e:
+        return jsonify({"error": f"Некорректное модельное время: {e}"}), 400
+    if not timestamps:
+        return jsonify({"error": "Пакет отметок пуст."}), 400
+
+    for model_ts in timestamps:
+        clock.sync(model_ts)
+    scheduler.wake()
+
+    return jsonify({"time": from_epoch(timestamps[-1])}), 200
+
+
+# Пассажиры из пакета ответа внешнего модуля вместе с поведением, статусом и рейсом, полученными одним запросом.
+# Записи с некорректным или неизвестным id попадают в failed и дальше не обрабатываются.
+def load_callback_passengers(data, id_key, failed):
+    metrics.callback_batch_size.observe(len(data), route=request.endpoint)
+    metrics.callback_bytes.observe(request.content_length or 0, route=request.endpoint)
+
+    items = []
+    for info in data:
+        raw_id = info.get(id_key) if isinstance(info, dict) else None
+        try:
+            items.append((int(raw_id), info))
+        except (TypeError, ValueError):
+            failed.append({id_key: raw_id, "error": "Некорректный id пассажира."})
+
+    known = {passenger[0]: passenger for passenger in repository.passengers([passenger_id for passenger_id, _ in items])}
+
+    passengers = []
+    for passenger_id, info in items:
+        if passenger_id in known:
+            passenger = known[passenger_id]
+            passengers.append((passenger_id, passenger[1], passenger[2], passenger[4], info))
+        else:
+            failed.append({id_key: passenger_id, "error": "Пассажир не найден."})
+    return passengers
+
+
+# Применение событий {событие: [(passenger_id, behavior, status, flight_id)]} из ответа внешнего модуля.
+# Пассажиры, статус которых не допускает события (например, уже покидающие аэропорт), попадают в failed.
+def apply_callback_events(events, now_ts, id_key, failed):
+    outcomes = []
+    for event, passengers in events.items():
+        outcome = lifecycle.apply(event, passengers, now_ts)
+        failed.extend({id_key: passenger_id, "error": f"Недопустимый ответ для статуса '{Status(status).label}'."}
+                      for passenger_id, status in outcome.rejected)
+        outcomes.append(outcome)
+    return outcomes
+
+
 @app.route('/passenger/ticket', methods=['POST'])
 def buy_ticket():
     data = request.json
-    global current_time
+    now_ts = clock.now()
 
-    for info in data:
-        passenger_id = info.get("PassengerId")
-        status = info.get("Status")
+    failed = []
+    events = {}
+    deleted = None
 
-        conn = sqlite3.connect('passengers.db')
-        c = conn.cursor()
-        try:
-            c.execute("SELECT behavior FROM passengers WHERE id = ?", (passenger_id,))
-            behavior = c.fetchone()[0]
-
-            if status == 'Successful':
-                if behavior == "Возврат":
-                    new_status = "Возврат билета"
-                    model_time = random_time(current_time, manipulate_time(current_time, '+', time_period))
-                elif behavior == "Опоздавший регистрация":
-                    new_status = "Ожидание регистрации"
-                    model_time = current_time
-                else:
-                    new_status = "Ожидание регистрации"
-                    model_time = current_time
-
-                c.execute("UPDATE passengers SET status = ?, action_time = ? WHERE id = ?",
-                          (new_status, model_time, passenger_id))
-            elif status == 'Unsuccessful':
-                c.execute("SELECT EXISTS (SELECT 1 FROM flights WHERE is_check_in = '0');")
-                result = c.fetchone()[0]
-
-                if result:
-                    if random.random() > 0.2:
-                        c.execute("SELECT flight_id FROM flights ORDER BY RANDOM() LIMIT 1;")
-                        flight_id = c.fetchone()[0]
-                        new_status = 'Поиск билета'
-                        model_time = current_time
-
-                        c.execute("UPDATE passengers SET status = ?, action_time = ?, flight_id = ? WHERE id = ?",
-                              (new_status, model_time, flight_id, passenger_id))
-                    else:
-                        new_status = 'Удаление'
-                        model_time = current_time
-
-                        c.execute("UPDATE passengers SET status = ?, action_time = ? WHERE id = ?",
-                              (new_status, model_time, passenger_id))
-                    passenger_logger.info(f"Пассажир {passenger_id} изменил свой статус с 'Покупка билета' на '{new_status}'.")
+    try:
+        with repository.transaction():
+            # Рейсов, открытых для продажи, нет совсем (а не только свободных мест):
+            # все покупающие билет покидают аэропорт.
+            no_flights = False
+            for passenger_id, behavior, passenger_status, passenger_flight, info in load_callback_passengers(
+                    data, "PassengerId", failed):
+                status = info.get("Status")
+
+                if status == 'Successful':
+                    event = Event.TICKET_BOUGHT
+                elif status == 'Unsuccessful':
+                    if not open_flights.open_count():
+                        no_flights = True
+                        continue
+                    event = Event.TICKET_FAILED
                 else:
-                    c.execute("delete from passengers where status = 'Покупка билета'")
-                    deleted = c.rowcount
-                    passenger_logger.info(f"{deleted} людей покинуло аэропорт ввиду отсутствия доступных рейсов.")
+                    failed.append({"PassengerId": passenger_id, "error": f"Неизвестный статус покупки: {status}."})
+                    continue
 
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            print(
-                f"{time.strftime("%H:%M:%S", time.localtime())} - Произошла ошибка во время покупки билетов пассажирами.")
+                events.setdefault(event, []).append((passenger_id, behavior, passenger_status, passenger_flight))
 
-            return jsonify({"error": str(e)}), 500
+            outcomes = apply_callback_events(events, now_ts, "PassengerId", failed)
 
-        finally:
-            conn.close()
+            if no_flights:
+                flight_ids = delete_passengers(Status.BUYING)
+                release_seats(flight_ids)
+                deleted = len(flight_ids)
+    except Exception as e:
+        print(
+            f"{time.strftime("%H:%M:%S", time.localtime())} - Произошла ошибка во время покупки билетов пассажирами.")
 
-    return jsonify(), 200
+        return jsonify({"error": str(e)}), 500
+
+    for outcome in outcomes:
+        lifecycle.record_outcome(outcome, now_ts)
+    if deleted is not None:
+        passenger_logger.info(f"{deleted} людей покинуло аэропорт ввиду отсутствия доступных рейсов.")
+
+    return jsonify({"failed": failed}), 200
 
 
 @app.route('/passenger/return-ticket', methods=['POST'])
 def return_ticket():
     data = request.json
+    now_ts = clock.now()
 
-    for info in data:
-        new_status = ''
-        passenger_id = info.get("PassengerId")
-        status = info.get("Status")
-
-        conn = sqlite3.connect('passengers.db')
-        c = conn.cursor()
+    failed = []
+    events = {}
 
-        try:
-            if status == 'Successful':
-                new_status = 'Удаление'
-            elif status == 'Unsuccessful':
-                if random.random() > 0.3:
-                    new_status = 'Удаление'
+    try:
+        with repository.transaction():
+            for passenger_id, behavior, passenger_status, passenger_flight, info in load_callback_passengers(
+                    data, "PassengerId", failed):
+                status = info.get("Status")
+
+                if status == 'Successful':
+                    event = Event.TICKET_RETURNED
+                elif status == 'Unsuccessful':
+                    event = Event.RETURN_FAILED
                 else:
-                    new_status = 'Поиск билета'
+                    failed.append({"PassengerId": passenger_id, "error": f"Неизвестный статус возврата: {status}."})
+                    continue
 
-            c.execute("UPDATE passengers SET status = ? where id = ?",
-                      (new_status, passenger_id))
-            passenger_logger.info(f"Пассажир {passenger_id} изменил свой статус с 'Возврат билета' на '{new_status}'.")
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            print(
-                f"{time.strftime("%H:%M:%S", time.localtime())} - Произошла ошибка во время возврата билетов пассажирами.")
+                events.setdefault(event, []).append((passenger_id, behavior, passenger_status, passenger_flight))
 
-            return jsonify({"error": str(e)}), 500
+            outcomes = apply_callback_events(events, now_ts, "PassengerId", failed)
+    except Exception as e:
+        print(
+            f"{time.strftime("%H:%M:%S", time.localtime())} - Произошла ошибка во время возврата билетов пассажирами.")
 
-        finally:
-            conn.close()
+        return jsonify({"error": str(e)}), 500
 
-    return jsonify(), 200
+    for outcome in outcomes:
+        lifecycle.record_outcome(outcome, now_ts)
+
+    return jsonify({"failed": failed}), 200
 
 
 @app.route('/passenger/check-in', methods=['POST'])
 def check_in():
     data = request.json
-    global current_time
+    now_ts = clock.now()
 
-    for info in data:
-        passenger_id = info.get("PassengerId")
-        status = info.get("Status")
-        new_status = ''
+    failed = []
+    events = {}
 
-        conn = sqlite3.connect('passengers.db')
-        c = conn.cursor()
-        try:
-            if status == 'Successful':
-                c.execute("UPDATE passengers SET status = ? WHERE id = ?",
-                          ('На посадку', passenger_id))
-                new_status = 'На посадку'
+    try:
+        with repository.transaction():
+            for passenger_id, behavior, passenger_status, passenger_flight, info in load_callback_passengers(
+                    data, "PassengerId", failed):
+                status = info.get("Status")
+
+                if status == 'Successful':
+                    event = Event.CHECKED_IN
+                elif status == 'Unsuccessful':
+                    event = Event.CHECK_IN_FAILED
+                else:
+                    failed.append({"PassengerId": passenger_id, "error": f"Неизвестный статус регистрации: {status}."})
+                    continue
 
-            elif status == 'Unsuccessful':
-                c.execute("UPDATE passengers SET status = ? WHERE id = ?", ('Удаление', passenger_id))
-                new_status = 'Удаление'
+                events.setdefault(event, []).append((passenger_id, behavior, passenger_status, passenger_flight))
 
-            passenger_logger.info(f"Пассажир {passenger_id} изменил свой статус с 'Регистрация' на {new_status}.")
-            conn.commit()
+            outcomes = apply_callback_events(events, now_ts, "PassengerId", failed)
+    except Exception as e:
+        print(f"{time.strftime("%H:%M:%S", time.localtime())} - Произошла ошибка во время регистрации пассажиров.")
 
-        except Exception as e:
-            conn.rollback()
-            print(f"{time.strftime("%H:%M:%S", time.localtime())} - Произошла ошибка во время регистрации пассажиров.")
+        return jsonify({"error": str(e)}), 500
 
-            return jsonify({"error": str(e)}), 500
+    for outcome in outcomes:
+        lifecycle.record_outcome(outcome, now_ts)
 
-        finally:
-            conn.close()
-
-    return jsonify(), 200
+    return jsonify({"failed": failed}), 200
 
 
 @app.route('/passenger/transporting', methods=['POST'])
 def transporting():
     data = request.json
-    passengers = [item['passenger_id'] for item in data]
+    now_ts = clock.now()
 
-    conn = sqlite3.connect('passengers.db')
-    c = conn.cursor()
+    failed = []
 
     try:
-        for passenger_id in passengers:
-            c.execute("UPDATE passengers SET status = ? WHERE id = ?", ("Транспортировка", passenger_id))
-            passenger_logger.info(f"Пассажир {passenger_id} изменил свой статус с 'На посадку' на 'Транспортировка'.")
-
-        conn.commit()
-
-    except sqlite3.OperationalError as e:
-        conn.rollback()
+        with repository.transaction():
+            passengers = [passenger[:4] for passenger in load_callback_passengers(data, "passenger_id", failed)]
+            outcomes = apply_callback_events({Event.TRANSPORTED: passengers}, now_ts, "passenger_id", failed)
+    except Exception as e:
         print(f"{time.strftime("%H:%M:%S", time.localtime())} - Произошла ошибка при транспортировки пассажиров.")
 
         return jsonify({"error": str(e)}), 500
 
-    finally:
-        conn.close()
+    for outcome in outcomes:
+        lifecycle.record_outcome(outcome, now_ts)
 
-    return jsonify(), 200
+    return jsonify({"failed": failed}), 200
 
 
 @app.route('/passenger/on-board', methods=['POST'])
 def on_board():
     data = request.json
+    now_ts = clock.now()
 
-    for info in data:
-        conn = sqlite3.connect('passengers.db')
-        c = conn.cursor()
-        try:
-            passenger_id = info.get("passenger_id")
-            c.execute("UPDATE passengers SET status = ? WHERE id = ?",
-                      ("На борту", passenger_id))
-            passenger_logger.info(f"Пассажир {passenger_id} изменил свой статус с 'Транспортировка' на 'На борту'.")
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            print(f"{time.strftime("%H:%M:%S", time.localtime())} - Произошла во время посадки пассажиров в самолёт.")
+    failed = []
 
-            return jsonify({"error": str(e)}), 500
+    try:
+        with repository.transaction():
+            passengers = [passenger[:4] for passenger in load_callback_passengers(data, "passenger_id", failed)]
+            outcomes = apply_callback_events({Event.BOARDED: passengers}, now_ts, "passenger_id", failed)
+    except Exception as e:
+        print(f"{time.strftime("%H:%M:%S", time.localtime())} - Произошла во время посадки пассажиров в самолёт.")
 
-        finally:
-            conn.close()
+        return jsonify({"error": str(e)}), 500
 
-    return jsonify(), 200
+    for outcome in outcomes:
+        lifecycle.record_outcome(outcome, now_ts)
+
+    return jsonify({"failed": failed}), 200
 
 
 if __name__ == '__main__':
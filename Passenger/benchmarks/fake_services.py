@@ -0,0 +1,152 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+
+from model_time import TIME_FORMAT
+
+
+# Фоновый HTTP-сервер для приложения Flask на свободном локальном порту.
+class LocalServer:
+    def __init__(self, app, host='127.0.0.1', port=0):
+        self._server = make_server(host, port, app, threaded=True)
+        self.host = f"{host}:{self._server.server_port}"
+        self._thread = threading.Thread(target=self._server.serve_forever, name=f'server-{self.host}', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+
+
+# Заглушки внешних модулей: табло (модельное время), касса (покупка и возврат билетов),
+# регистрация и транспорт. Касса и регистрация отвечают на пакет сразу, а результат по каждому
+# пассажиру присылают отдельным запросом к модулю пассажиров, как настоящие модули.
+# latency - средняя задержка ответа в секундах (равномерно от 0 до 2 * latency), failure_rate - доля
+# запросов, на которые заглушка отвечает 503, unsuccessful_rate - доля отказов в покупке, возврате и регистрации.
+class FakeServices:
+    def __init__(self, latency=0.0, failure_rate=0.0, unsuccessful_rate=0.1, callback_workers=8, seed=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.unsuccessful_rate = unsuccessful_rate
+        self.passenger_host = None  # Адрес модуля пассажиров, задаётся после его запуска.
+        self.model_time = None  # Время, которое сообщает табло (секунды эпохи).
+        self.closed_flights = set()  # Рейсы с закрытой регистрацией: регистрация на них отклоняется.
+        self.boarding = {}  # Зарегистрированные пассажиры по рейсам для транспорта.
+        self.stats = {"requests": 0, "injected_failures": 0, "callbacks": 0, "callback_errors": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0
+        self._session = requests.Session()
+        self._executor = ThreadPoolExecutor(max_workers=callback_workers, thread_name_prefix='fake-callback')
+        self.app = self._create_app()
+
+    def _create_app(self):
+        app = Flask('fake_services')
+
+        @app.route('/dep-board/api/v1/time/now')
+        def time_now():
+            if self.model_time is None:
+                return jsonify({"error": "Время ещё не задано."}), 503
+            return f'"{board_time(self.model_time)}"', 200
+
+        @app.route('/ticket-office/buy-ticket', methods=['POST'])
+        def buy_ticket():
+            return self._respond(request.json, '/passenger/ticket', self._ticket_results)
+
+        @app.route('/ticket-office/return-ticket', methods=['POST'])
+        def return_ticket():
+            return self._respond(request.json, '/passenger/return-ticket', self._ticket_results)
+
+        @app.route('/checkin/passenger', methods=['POST'])
+        def check_in():
+            return self._respond(request.json, '/passenger/check-in', self._check_in_results)
+
+        return app
+
+    # Ответ на пакет: задержка, возможный отказ и отложенная отправка результатов.
+    def _respond(self, payload, callback_path, make_results):
+        with self._lock:
+            self.stats["requests"] += 1
+            failed = self._random.random() < self.failure_rate
+            delay = self._random.uniform(0, 2 * self.latency) if self.latency else 0
+            if failed:
+                self.stats["injected_failures"] += 1
+        if delay:
+            time.sleep(delay)
+        if failed:
+            return jsonify({"error": "Сбой, внесённый заглушкой."}), 503
+
+        results = make_results(payload)
+        self._submit(callback_path, results)
+        return jsonify({"accepted": len(payload)}), 200
+
+    def _ticket_results(self, payload):
+        with self._lock:
+            return [{"PassengerId": item["passenger_id"],
+                     "Status": 'Unsuccessful' if self._random.random() < self.unsuccessful_rate else 'Successful'}
+                    for item in payload]
+
+    def _check_in_results(self, payload):
+        results = []
+        with self._lock:
+            for item in payload:
+                flight_id = str(item.get("flight_id"))
+                if flight_id in self.closed_flights or self._random.random() < self.unsuccessful_rate:
+                    results.append({"PassengerId": item["passenger_id"], "Status": 'Unsuccessful'})
+                else:
+                    results.append({"PassengerId": item["passenger_id"], "Status": 'Successful'})
+                    self.boarding.setdefault(flight_id, []).append(item["passenger_id"])
+        return results
+
+    def _submit(self, path, payload):
+        with self._lock:
+            self._pending += 1
+        self._executor.submit(self._callback, path, payload)
+
+    def _callback(self, path, payload):
+        try:
+            self._session.post(f"http://{self.passenger_host}{path}", json=payload, timeout=60).raise_for_status()
+            error = False
+        except requests.RequestException:
+            error = True
+        with self._lock:
+            self.stats["callbacks"] += 1
+            self.stats["callback_errors"] += error
+            self._pending -= 1
+            if not self._pending:
+                self._idle.notify_all()
+
+    # Ожидание доставки всех отложенных результатов.
+    def wait_idle(self, timeout=None):
+        with self._lock:
+            return self._idle.wait_for(lambda: not self._pending, timeout)
+
+    # Закрытие регистрации на рейс: дальнейшие запросы регистрации по нему отклоняются.
+    def close_check_in(self, flight_id):
+        with self._lock:
+            self.closed_flights.add(str(flight_id))
+
+    # Транспорт: пассажиры рейса, прошедшие регистрацию, доставляются к самолёту и садятся в него.
+    def depart(self, flight_id):
+        with self._lock:
+            passengers = self.boarding.pop(str(flight_id), [])
+        if passengers:
+            payload = [{"passenger_id": passenger_id} for passenger_id in passengers]
+            self._session.post(f"http://{self.passenger_host}/passenger/transporting", json=payload,
+                               timeout=60).raise_for_status()
+            self._session.post(f"http://{self.passenger_host}/passenger/on-board", json=payload,
+                               timeout=60).raise_for_status()
+        return len(passengers)
+
+
+# Текст модельного времени в формате табло.
+def board_time(ts):
+    return time.strftime(TIME_FORMAT, time.gmtime(ts)).replace(' ', 'T') + '.0000000'
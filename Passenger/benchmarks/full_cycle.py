@@ -0,0 +1,220 @@
+# Сквозной бенчмарк модуля пассажиров: полный жизненный цикл пассажиров на заглушках табло,
+# кассы, регистрации и транспорта. Каждый масштаб запускается в отдельном процессе с чистой базой.
+#
+#     python -m benchmarks.full_cycle --passengers 1000 10000 100000 --flights 20
+#
+# Запускается из каталога Passenger. Отчёт: пропускная способность (смен статуса в секунду и
+# пассажиров, севших в самолёт, в секунду), задержка тиков, размер базы и журнала переходов.
+import argparse
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+PASSENGER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PASSENGER_DIR not in sys.path:
+    sys.path.insert(0, PASSENGER_DIR)
+
+import requests  # noqa: E402
+
+from benchmarks.fake_services import FakeServices, LocalServer, board_time  # noqa: E402
+from model_time import to_epoch  # noqa: E402
+
+START_TIME = '2024-01-01 10:00:00'  # Начало модельного времени прогона.
+CREATE_BATCH = 10000  # Пассажиров в одном запросе /create_passengers.
+CHECK_IN_DURATION = 60  # Минуты от начала до конца регистрации на рейс.
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Сквозной бенчмарк модуля пассажиров.")
+    parser.add_argument('--passengers', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help="Число пассажиров для каждого прогона.")
+    parser.add_argument('--flights', type=int, default=10, help="Число рейсов.")
+    parser.add_argument('--capacity-margin', type=float, default=1.2,
+                        help="Вместимость рейсов относительно числа пассажиров на рейс.")
+    parser.add_argument('--check-in-after', type=int, default=60, help="Минуты до начала регистрации первого рейса.")
+    parser.add_argument('--stagger', type=int, default=10, help="Минуты между началом регистрации соседних рейсов.")
+    parser.add_argument('--step', type=int, default=1, help="Шаг модельного времени между тиками, минуты.")
+    parser.add_argument('--tail', type=int, default=60, help="Минуты после вылета последнего рейса до конца прогона.")
+    parser.add_argument('--latency', type=float, default=0.0, help="Средняя задержка ответа заглушек, секунды.")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Доля запросов, на которые заглушки отвечают 503.")
+    parser.add_argument('--unsuccessful-rate', type=float, default=0.1,
+                        help="Доля отказов кассы и регистрации по пассажиру.")
+    parser.add_argument('--engine', choices=('sqlite', 'memory'), default='sqlite', help="Хранилище модуля.")
+    parser.add_argument('--seed', type=int, default=None, help="Зерно заглушек и симуляции модуля пассажиров.")
+    parser.add_argument('--callback-timeout', type=float, default=120, help="Секунды ожидания ответов заглушек после тика.")
+    parser.add_argument('--single', type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--json', action='store_true', help="Вывести результаты в JSON.")
+    return parser.parse_args(argv)
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def file_size(*paths):
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+
+# Один прогон в текущем процессе: модуль импортируется после настройки окружения,
+# поэтому база, журналы и адреса внешних модулей берутся из рабочего каталога прогона.
+def run_single(passengers, args):
+    workdir = tempfile.mkdtemp(prefix='passenger-bench-')
+    shutil.copy(os.path.join(PASSENGER_DIR, 'passengers.db'), workdir)  # Исходная схема, к которой применяются миграции.
+    os.chdir(workdir)
+
+    fakes = FakeServices(latency=args.latency, failure_rate=args.failure_rate,
+                         unsuccessful_rate=args.unsuccessful_rate, seed=args.seed)
+    fake_server = LocalServer(fakes.app).start()
+    os.environ.update(PASSENGER_BOARD_HOST=fake_server.host, PASSENGER_TICKET_OFFICE_HOST=fake_server.host,
+                      PASSENGER_TRANSPORT_HOST=fake_server.host, PASSENGER_TICKER='0', PASSENGER_STORAGE=args.engine)
+    if args.seed is not None:
+        os.environ['PASSENGER_SEED'] = str(args.seed)  # Та же нагрузка модуля пассажиров от прогона к прогону.
+
+    import app as passenger_app
+    passenger_app.repository.clear()
+    passenger_app.recount_passengers()
+    passenger_server = LocalServer(passenger_app.app).start()
+    fakes.passenger_host = passenger_server.host
+
+    session = requests.Session()
+
+    def post(path, payload=None):
+        response = session.post(f"http://{passenger_server.host}{path}", json=payload, timeout=600)
+        response.raise_for_status()
+        return response
+
+    def set_time(ts):
+        fakes.model_time = ts
+        post('/passenger/time', board_time(ts))
+
+    now = to_epoch(START_TIME)
+    set_time(now)
+
+    capacity = math.ceil(passengers / args.flights * args.capacity_margin)
+    events = {}
+    for number in range(args.flights):
+        flight_id = number + 1
+        post('/passenger/available-flight', {"flightId": flight_id, "airplaneId": flight_id, "capacity": capacity})
+        opens = now + (args.check_in_after + number * args.stagger) * 60
+        events.setdefault(opens, []).append(('open', flight_id))
+        events.setdefault(opens + CHECK_IN_DURATION * 60, []).append(('close', flight_id))
+    end = max(events) + args.tail * 60
+
+    started = time.perf_counter()
+    created = 0
+    while created < passengers:
+        count = min(CREATE_BATCH, passengers - created)
+        post('/create_passengers', {"num_passengers": count, "behavior": 'Случайно'})
+        created += count
+    create_seconds = time.perf_counter() - started
+
+    tick_seconds = []
+    ticks_started = time.perf_counter()
+    while now <= end:
+        for kind, flight_id in events.pop(now, []):
+            if kind == 'open':
+                post(f'/passenger/check-in/start/{flight_id}', board_time(now + CHECK_IN_DURATION * 60))
+            else:
+                # Регистрация закрывается, зарегистрированные пассажиры везутся к самолёту.
+                fakes.close_check_in(flight_id)
+                fakes.wait_idle(args.callback_timeout)
+                post(f'/passenger/check-in/end/{flight_id}')
+                fakes.depart(flight_id)
+
+        tick_started = time.perf_counter()
+        passenger_app.run_tick(now)
+        tick_seconds.append(time.perf_counter() - tick_started)
+        fakes.wait_idle(args.callback_timeout)
+
+        if not events and not passenger_app.repository.status_counts():
+            break
+        now += args.step * 60
+        set_time(now)
+    wall_seconds = time.perf_counter() - started
+
+    if hasattr(passenger_app.repository, 'snapshot'):
+        passenger_app.repository.snapshot()
+    transitions = passenger_app.metrics.transitions_total
+    boarded = transitions.value(old_status='TRANSPORTING', new_status='ON_BOARD')
+    remaining = {passenger_app.Status(status).name: count
+                 for status, count in passenger_app.repository.status_counts().items()}
+
+    passenger_server.stop()
+    fake_server.stop()
+    result = {
+        "passengers": passengers,
+        "flights": args.flights,
+        "engine": args.engine,
+        "wall_seconds": round(wall_seconds, 3),
+        "create_seconds": round(create_seconds, 3),
+        "ticks": len(tick_seconds),
+        "model_minutes": (now - to_epoch(START_TIME)) // 60,
+        "transitions": transitions.value(),
+        "transitions_per_second": round(transitions.value() / (time.perf_counter() - ticks_started), 1),
+        "boarded": boarded,
+        "boarded_per_second": round(boarded / wall_seconds, 1),
+        "tick_p50_ms": round(percentile(tick_seconds, 50) * 1000, 2),
+        "tick_p95_ms": round(percentile(tick_seconds, 95) * 1000, 2),
+        "tick_p99_ms": round(percentile(tick_seconds, 99) * 1000, 2),
+        "tick_max_ms": round(max(tick_seconds, default=0) * 1000, 2),
+        "db_bytes": file_size('passengers.db', 'passengers.db-wal'),
+        "journal_bytes": file_size('transitions.journal'),
+        "remaining": remaining,
+        "fake_services": fakes.stats,
+    }
+    shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+
+# Аргументы командной строки для прогона одного масштаба в дочернем процессе.
+def single_argv(passengers, args):
+    argv = ['--single', str(passengers)]
+    for name in ('flights', 'capacity_margin', 'check_in_after', 'stagger', 'step', 'tail', 'latency', 'failure_rate',
+                 'unsuccessful_rate', 'engine', 'seed', 'callback_timeout'):
+        value = getattr(args, name)
+        if value is not None:
+            argv.extend([f"--{name.replace('_', '-')}", str(value)])
+    return argv
+
+
+def print_table(results):
+    columns = ('passengers', 'wall_seconds', 'ticks', 'transitions_per_second', 'boarded_per_second', 'tick_p50_ms',
+               'tick_p95_ms', 'tick_max_ms', 'db_bytes')
+    widths = [max(len(column), *(len(str(result.get(column, ''))) for result in results)) for column in columns]
+    print('  '.join(column.rjust(width) for column, width in zip(columns, widths)))
+    for result in results:
+        print('  '.join(str(result.get(column, '')).rjust(width) for column, width in zip(columns, widths)))
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.single is not None:
+        print(json.dumps(run_single(args.single, args), ensure_ascii=False))
+        return
+
+    results = []
+    for passengers in args.passengers:
+        completed = subprocess.run([sys.executable, '-m', 'benchmarks.full_cycle', *single_argv(passengers, args)],
+                                   cwd=PASSENGER_DIR, capture_output=True, text=True)
+        if completed.returncode:
+            print(completed.stdout[-2000:], completed.stderr[-2000:], file=sys.stderr)
+            results.append({"passengers": passengers, "error": f"Код завершения {completed.returncode}"})
+            continue
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print_table(results)
+
+
+if __name__ == '__main__':
+    main()
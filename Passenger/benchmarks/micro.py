@@ -0,0 +1,187 @@
+# Микробенчмарки горячих вспомогательных функций и пакетных путей записи в SQLite (timeit).
+#
+#     python -m benchmarks.micro --save-baseline   # записать базовые результаты
+#     python -m benchmarks.micro                   # сравнить с ними
+#
+# Запускается из каталога Passenger. Время на вызов - лучшее из repeat повторов по number вызовов.
+# Замедление относительно базовых результатов больше threshold раз отмечается как регрессия,
+# и программа завершается с кодом 1.
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+PASSENGER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PASSENGER_DIR not in sys.path:
+    sys.path.insert(0, PASSENGER_DIR)
+
+from generation import generate_passengers, random_baggage_weight, random_baggage_weights, random_behavior  # noqa: E402
+from generation import random_behaviors  # noqa: E402
+from model_time import convert_to_sqlite_format, manipulate_time, random_time, random_times, table_convert  # noqa: E402
+from model_time import to_epoch  # noqa: E402
+from statuses import Status  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'micro_baseline.json')
+THRESHOLD = 1.25  # Во сколько раз медленнее базового результата считается регрессией.
+BULK_SIZE = 1000  # Пассажиров в одной пакетной вставке или обновлении.
+
+NOW_TS = to_epoch('2024-01-01 10:00:00')
+
+
+# Случаи: имя -> (функция, создающая вызываемый объект, число вызовов в повторе).
+# Пакетные случаи работают с временной базой, которую создаёт sqlite_repository.
+def helper_cases():
+    return {
+        'random_time': (lambda: lambda: random_time(NOW_TS, NOW_TS + 30 * 60), 100000),
+        'random_times_1000': (lambda: lambda: random_times(NOW_TS, NOW_TS + 30 * 60, BULK_SIZE), 1000),
+        'manipulate_time': (lambda: lambda: manipulate_time(NOW_TS, '+', 30), 200000),
+        'table_convert': (lambda: lambda: table_convert('"2024-01-01T10:00:00.0000000"'), 20000),
+        'convert_to_sqlite_format': (lambda: lambda: convert_to_sqlite_format('01/01/2024 10:00:00 AM'), 20000),
+        'random_behavior': (lambda: random_behavior, 100000),
+        'random_behaviors_1000': (lambda: lambda: random_behaviors(BULK_SIZE), 1000),
+        'random_baggage_weight': (lambda: random_baggage_weight, 100000),
+        'random_baggage_weights_1000': (lambda: lambda: random_baggage_weights(BULK_SIZE), 1000),
+        'generate_passengers_1000': (lambda: lambda: generate_passengers(BULK_SIZE, 'Случайно', None, NOW_TS), 200),
+    }
+
+
+def bulk_cases(repository):
+    def insert():
+        rows = generate_passengers(BULK_SIZE, 'Случайно', None, NOW_TS)
+        return lambda: repository.insert_passengers(rows)
+
+    def update():
+        ids = repository.insert_passengers(generate_passengers(BULK_SIZE, 'Случайно', None, NOW_TS))
+        rows = [(NOW_TS + 60, '1', passenger_id) for passenger_id in ids]
+        return lambda: repository.update_passengers(Status.BUYING, rows)
+
+    # Путь диспетчера: чтение наступившей пачки по id и отметка об отправке внешнему модулю.
+    def dispatch():
+        ids = repository.insert_passengers([(behavior, Status.BUYING, weight, NOW_TS) for behavior, _, weight, _
+                                            in generate_passengers(BULK_SIZE, 'Случайно', None, NOW_TS)])
+
+        def call():
+            repository.passengers(ids)
+            repository.mark_awaiting(Status.BUYING, ids, NOW_TS + 600)
+        return call
+
+    return {
+        'sqlite_insert_1000': (insert, 20),
+        'sqlite_update_1000': (update, 20),
+        'sqlite_dispatch_1000': (dispatch, 20),
+    }
+
+
+# Временная база с актуальной схемой в отдельном рабочем каталоге: пул соединений
+# открывает passengers.db относительно текущего каталога.
+def sqlite_repository():
+    workdir = tempfile.mkdtemp(prefix='passenger-micro-')
+    shutil.copy(os.path.join(PASSENGER_DIR, 'passengers.db'), workdir)
+    os.chdir(workdir)
+
+    from db import migrate
+    from storage import SQLiteRepository
+
+    migrate()
+    repository = SQLiteRepository()
+    repository.clear()
+    return repository, workdir
+
+
+def measure(make_callable, number, repeat):
+    timer = timeit.Timer(make_callable())
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run(repeat, names=None):
+    results = {}
+    cases = helper_cases()
+    for name, (make_callable, number) in cases.items():
+        if names is None or name in names:
+            results[name] = measure(make_callable, number, repeat)
+
+    bulk_names = [name for name in bulk_cases(None) if names is None or name in names]
+    if bulk_names:
+        cwd = os.getcwd()
+        repository, workdir = sqlite_repository()
+        try:
+            for name, (make_callable, number) in bulk_cases(repository).items():
+                if name in bulk_names:
+                    results[name] = measure(make_callable, number, repeat)
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_baseline(path, results):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+        file.write('\n')
+
+
+# Сравнение с базовыми результатами: [(имя, секунды на вызов, базовые секунды, отношение, отметка)].
+def compare(results, baseline, threshold=THRESHOLD):
+    rows = []
+    for name, seconds in results.items():
+        base = baseline.get(name)
+        if base is None:
+            rows.append((name, seconds, None, None, 'нет базы'))
+            continue
+        ratio = seconds / base if base else float('inf')
+        if ratio > threshold:
+            mark = 'РЕГРЕССИЯ'
+        elif ratio < 1 / threshold:
+            mark = 'ускорение'
+        else:
+            mark = ''
+        rows.append((name, seconds, base, ratio, mark))
+    return rows
+
+
+def format_time(seconds):
+    if seconds is None:
+        return '-'
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.3f} мс"
+    return f"{seconds * 1e6:.3f} мкс"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Микробенчмарки модуля пассажиров.")
+    parser.add_argument('names', nargs='*', help="Имена случаев (по умолчанию все).")
+    parser.add_argument('--repeat', type=int, default=5, help="Число повторов, берётся лучший.")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="Файл базовых результатов.")
+    parser.add_argument('--save-baseline', action='store_true', help="Записать результаты как базовые.")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help="Порог регрессии (отношение к базе).")
+    args = parser.parse_args(argv)
+
+    results = run(args.repeat, set(args.names) or None)
+    if args.save_baseline:
+        baseline = load_baseline(args.baseline)
+        baseline.update(results)
+        save_baseline(args.baseline, baseline)
+        for name, seconds in results.items():
+            print(f"{name:32} {format_time(seconds):>14}")
+        print(f"Базовые результаты записаны в {args.baseline}.")
+        return 0
+
+    rows = compare(results, load_baseline(args.baseline), args.threshold)
+    for name, seconds, base, ratio, mark in rows:
+        ratio_text = '-' if ratio is None else f"x{ratio:.2f}"
+        print(f"{name:32} {format_time(seconds):>14} {format_time(base):>14} {ratio_text:>8}  {mark}")
+    return 1 if any(mark == 'РЕГРЕССИЯ' for *_, mark in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,174 @@
+import queue
+import sqlite3
+import threading
+
+from statuses import BEHAVIOR_LABELS, STATUS_LABELS, Status, label_case
+
+DB_PATH = 'passengers.db'
+
+# Параметры соединений.
+BUSY_TIMEOUT = 5  # Секунды ожидания снятия блокировки базы.
+STATEMENT_CACHE_SIZE = 256  # Число подготовленных выражений, кешируемых на соединение.
+POOL_SIZE = 8  # Максимальное число простаивающих соединений в пуле.
+MAX_VARIABLES = 900  # Число параметров в одном IN (...), с запасом ниже SQLITE_MAX_VARIABLE_NUMBER.
+
+# Статусы пассажиров, занимающих место на рейсе: от назначения рейса при поиске билета до удаления.
+SEAT_STATUSES = [status for status in Status if status not in (Status.UNKNOWN, Status.SEARCHING, Status.LEAVING)]
+_SEAT_LABELS = ', '.join(f"'{STATUS_LABELS[status]}'" for status in SEAT_STATUSES)
+
+# Шаги миграции схемы. Номер шага хранится в PRAGMA user_version,
+# поэтому каждый шаг применяется к базе ровно один раз. Шаг выполняется в одной транзакции
+# вместе с записью номера: при ошибке его DDL откатывается целиком.
+MIGRATIONS = [
+    # 1. Индексы для выборки пассажиров по времени действия, статусу и рейсу.
+    [
+        "CREATE INDEX IF NOT EXISTS idx_passengers_action_time ON passengers (action_time)",
+        "CREATE INDEX IF NOT EXISTS idx_passengers_status_action_time ON passengers (status, action_time)",
+        "CREATE INDEX IF NOT EXISTS idx_passengers_flight_status ON passengers (flight_id, status)",
+        "CREATE INDEX IF NOT EXISTS idx_flights_flight_id ON flights (flight_id)",
+    ],
+    # 2. Время в секундах эпохи вместо текста "%Y-%m-%d %H:%M:%S".
+    [
+        "ALTER TABLE passengers ADD COLUMN action_ts INTEGER",
+        "ALTER TABLE passengers ADD COLUMN check_in_end_ts INTEGER",
+        "ALTER TABLE flights ADD COLUMN check_in_end_ts INTEGER",
+        "UPDATE passengers SET action_ts = CAST(strftime('%s', action_time) AS INTEGER), "
+        "check_in_end_ts = CAST(strftime('%s', check_in_end_time) AS INTEGER)",
+        "UPDATE flights SET check_in_end_ts = CAST(strftime('%s', check_in_end_time) AS INTEGER)",
+        "DROP INDEX IF EXISTS idx_passengers_action_time",
+        "DROP INDEX IF EXISTS idx_passengers_status_action_time",
+        "CREATE INDEX IF NOT EXISTS idx_passengers_action_ts ON passengers (action_ts)",
+        "CREATE INDEX IF NOT EXISTS idx_passengers_status_action_ts ON passengers (status, action_ts)",
+    ],
+    # 3. Ожидание ответа кассы или регистрации: число отправок пассажира внешнему модулю.
+    [
+        "ALTER TABLE passengers ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0",
+    ],
+    # 4. Вместимость рейса (NULL - без ограничения) и число занятых мест. Места, уже занятые пассажирами,
+    # подсчитываются по текстовым статусам, которые до шага 5 хранятся в таблице.
+    [
+        "ALTER TABLE flights ADD COLUMN capacity INTEGER",
+        "ALTER TABLE flights ADD COLUMN occupied INTEGER NOT NULL DEFAULT 0",
+        "UPDATE flights SET occupied = (SELECT COUNT(*) FROM passengers WHERE passengers.flight_id = flights.flight_id "
+        f"AND status IN ({_SEAT_LABELS}))",
+    ],
+    # 5. Статус и поведение - целочисленные коды statuses.Status и statuses.Behavior вместо текста.
+    # Таблица пересоздаётся, устаревшие текстовые столбцы action_time и check_in_end_time удаляются.
+    [
+        "CREATE TABLE passengers_new (id INTEGER PRIMARY KEY, behavior INTEGER NOT NULL, status INTEGER NOT NULL, "
+        "baggage_weight INTEGER, action_ts INTEGER, flight_id TEXT, check_in_end_ts INTEGER, "
+        "attempts INTEGER NOT NULL DEFAULT 0)",
+        f"INSERT INTO passengers_new (id, behavior, status, baggage_weight, action_ts, flight_id, check_in_end_ts, "
+        f"attempts) SELECT id, {label_case('behavior', BEHAVIOR_LABELS)}, "
+        f"{label_case('status', STATUS_LABELS)}, baggage_weight, action_ts, flight_id, check_in_end_ts, "
+        f"attempts FROM passengers",
+        "DROP TABLE passengers",
+        "ALTER TABLE passengers_new RENAME TO passengers",
+        "CREATE INDEX IF NOT EXISTS idx_passengers_action_ts ON passengers (action_ts)",
+        "CREATE INDEX IF NOT EXISTS idx_passengers_status_action_ts ON passengers (status, action_ts)",
+        "CREATE INDEX IF NOT EXISTS idx_passengers_flight_status ON passengers (flight_id, status)",
+    ],
+]
+
+
+# Приведение схемы базы к актуальной версии. Соединение открывается в режиме автофиксации
+# (isolation_level=None): модуль sqlite3 сам не начинает транзакцию перед DDL, поэтому
+# транзакция каждого шага открывается явно.
+def migrate(path=DB_PATH):
+    conn = sqlite3.connect(path, isolation_level=None)
+    c = conn.cursor()
+    try:
+        version = c.execute("PRAGMA user_version").fetchone()[0]
+        for number, steps in enumerate(MIGRATIONS[version:], start=version + 1):
+            c.execute("BEGIN")
+            for statement in steps:
+                c.execute(statement)
+            c.execute(f"PRAGMA user_version = {number}")
+            c.execute("COMMIT")
+    except sqlite3.Error:
+        if conn.in_transaction:
+            c.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+# Выборка по списку id с разбиением на части. В запросе должен быть плейсхолдер {placeholders}.
+def fetch_in(c, query, ids, params=()):
+    rows = []
+    for i in range(0, len(ids), MAX_VARIABLES):
+        chunk = ids[i:i + MAX_VARIABLES]
+        c.execute(query.format(placeholders=', '.join('?' * len(chunk))), (*params, *chunk))
+        rows.extend(c.fetchall())
+    return rows
+
+
+# Перевод группы пассажиров в один статус одним executemany.
+# Строки: (action_ts, flight_id, passenger_id); None оставляет прежнее значение столбца.
+# Смена статуса завершает ожидание ответа внешнего модуля.
+def update_passengers(c, status, rows):
+    c.executemany("UPDATE passengers SET status = ?, action_ts = COALESCE(?, action_ts), "
+                  "flight_id = COALESCE(?, flight_id), attempts = 0 WHERE id = ?",
+                  [(status, action_ts, flight_id, passenger_id) for action_ts, flight_id, passenger_id in rows])
+
+
+# Открытие соединения: WAL позволяет читателям не ждать писателя, synchronous=NORMAL
+# в режиме WAL не теряет целостность, а busy_timeout заменяет мгновенный 'database is locked' ожиданием.
+def connect(path=DB_PATH):
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, cached_statements=STATEMENT_CACHE_SIZE,
+                           check_same_thread=False)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT * 1000}")
+    return conn
+
+
+# Пул соединений. Поток, уже держащий соединение, при повторном acquire получает его же,
+# поэтому вложенные вызовы (тикер -> update_passenger_status) работают в одном соединении.
+class ConnectionPool:
+    def __init__(self, path=DB_PATH, size=POOL_SIZE):
+        self.path = path
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._local = threading.local()
+
+    def acquire(self):
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            self._local.depth += 1
+            return held
+
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = connect(self.path)
+
+        self._local.conn = conn
+        self._local.depth = 1
+        return conn
+
+    def release(self, conn):
+        if getattr(self._local, 'conn', None) is not conn:
+            raise RuntimeError("Соединение возвращается в пул не тем потоком, который его получил.")
+
+        self._local.depth -= 1
+        if self._local.depth:
+            return
+
+        self._local.conn = None
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
+pool = ConnectionPool()
+
+
+def acquire():
+    return pool.acquire()
+
+
+def release(conn):
+    pool.release(conn)
@@ -0,0 +1,161 @@
+import bisect
+import itertools
+import threading
+
+import rng
+
+
+# Ключ рейса: в SQLite flights.flight_id имеет тип INTEGER, passengers.flight_id - TEXT,
+# а табло присылает номер числом или строкой. Рейсы в памяти хранятся по числу.
+def flight_key(flight_id):
+    try:
+        return int(flight_id)
+    except (TypeError, ValueError):
+        return flight_id
+
+
+# Индекс рейсов, открытых для покупки билетов (регистрация ещё не началась).
+# Список id с позициями в словаре даёт добавление, удаление и равновероятный выбор за O(1).
+# Выбор с весами идёт бинарным поиском по накопленным весам, которые пересчитываются лениво
+# после изменения индекса. Вес рейса с ограниченной вместимостью - число свободных мест.
+# Рейс без свободных мест выбывает из выбора до освобождения места.
+class FlightIndex:
+    def __init__(self, random=None):
+        self._lock = threading.Lock()
+        self._ids = []
+        self._positions = {}
+        self._weights = {}
+        self._free = {}  # Свободные места рейса, None - вместимость не ограничена.
+        self._cumulative = None
+        self._random = random or rng.stream(rng.FLIGHTS)
+
+    # Число рейсов, доступных для выбора (со свободными местами).
+    def __len__(self):
+        return len(self._ids)
+
+    # Число рейсов, открытых для покупки билетов, включая заполненные.
+    def open_count(self):
+        with self._lock:
+            return len(self._weights)
+
+    def __contains__(self, flight_id):
+        return flight_key(flight_id) in self._positions
+
+    # Включение рейса в выбор. free - число свободных мест (None - без ограничения).
+    def add(self, flight_id, weight=1, free=None):
+        flight_id = flight_key(flight_id)
+        with self._lock:
+            self._weights[flight_id] = weight
+            self._free[flight_id] = free
+            if free is None or free > 0:
+                self._include(flight_id)
+            else:
+                self._exclude(flight_id)
+            self._cumulative = None
+
+    def set_weight(self, flight_id, weight):
+        flight_id = flight_key(flight_id)
+        with self._lock:
+            if flight_id in self._weights:
+                self._weights[flight_id] = weight
+                self._cumulative = None
+
+    def remove(self, flight_id):
+        flight_id = flight_key(flight_id)
+        with self._lock:
+            self._exclude(flight_id)
+            self._weights.pop(flight_id, None)
+            self._free.pop(flight_id, None)
+            self._cumulative = None
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+            self._positions.clear()
+            self._weights.clear()
+            self._free.clear()
+            self._cumulative = None
+
+    def ids(self):
+        with self._lock:
+            return list(self._ids)
+
+    def free_seats(self, flight_id):
+        with self._lock:
+            return self._free.get(flight_key(flight_id))
+
+    def _include(self, flight_id):
+        if flight_id not in self._positions:
+            self._positions[flight_id] = len(self._ids)
+            self._ids.append(flight_id)
+
+    # Исключение перестановкой последнего элемента на место удаляемого.
+    def _exclude(self, flight_id):
+        position = self._positions.pop(flight_id, None)
+        if position is None:
+            return
+        last = self._ids.pop()
+        if last != flight_id:
+            self._ids[position] = last
+            self._positions[last] = position
+
+    def _weight(self, flight_id):
+        free = self._free[flight_id]
+        return max(self._weights[flight_id] if free is None else free, 0)
+
+    def _sample(self, k, weighted):
+        if not self._ids or k <= 0:
+            return []
+        if not weighted:
+            return self._random.choices(self._ids, k=k)
+
+        if self._cumulative is None:
+            self._cumulative = list(itertools.accumulate(self._weight(flight_id) for flight_id in self._ids))
+        total = self._cumulative[-1]
+        if total <= 0:
+            return []
+        return [self._ids[bisect.bisect_right(self._cumulative, self._random.random() * total)] for _ in range(k)]
+
+    # k случайных рейсов (с повторениями) без занятия мест. Пустой список, если открытых рейсов нет.
+    def sample(self, k, weighted=False):
+        with self._lock:
+            return self._sample(k, weighted)
+
+    # Один случайный рейс или None.
+    def choice(self, weighted=False):
+        chosen = self.sample(1, weighted)
+        return chosen[0] if chosen else None
+
+    # Выбор рейсов для k пассажиров с занятием мест под одной блокировкой. Выборка идёт пакетом;
+    # пассажиры, которым не хватило мест на выбранном рейсе, выбираются повторно среди оставшихся.
+    # Возвращает не больше k рейсов: меньше, если свободные места закончились.
+    def assign(self, k, weighted=False):
+        with self._lock:
+            assigned = []
+            while len(assigned) < k:
+                chosen = self._sample(k - len(assigned), weighted)
+                if not chosen:
+                    break
+                for flight_id in chosen:
+                    if flight_id not in self._positions:
+                        continue
+                    free = self._free[flight_id]
+                    if free is not None:
+                        self._free[flight_id] = free - 1
+                        if free == 1:
+                            self._exclude(flight_id)
+                        self._cumulative = None
+                    assigned.append(flight_id)
+            return assigned
+
+    # Освобождение count мест на рейсе: заполненный рейс снова доступен для выбора.
+    def release(self, flight_id, count=1):
+        flight_id = flight_key(flight_id)
+        with self._lock:
+            free = self._free.get(flight_id)
+            if free is None:
+                return
+            self._free[flight_id] = free + count
+            if free + count > 0:
+                self._include(flight_id)
+            self._cumulative = None
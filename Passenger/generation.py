@@ -0,0 +1,95 @@
+import itertools
+
+import rng
+from statuses import Behavior, Status
+
+try:
+    import numpy as np
+except ImportError:  # NumPy необязателен, без него используется random.choices.
+    np = None
+
+BEHAVIORS = [Behavior.ORDINARY, Behavior.RETURN, Behavior.FRAUD_OFFICE, Behavior.FRAUD_CHECK_IN, Behavior.LATE_OFFICE,
+             Behavior.LATE_CHECK_IN]
+BEHAVIOR_WEIGHTS = [70, 10, 5, 5, 5, 5]
+BAGGAGE_WEIGHTS = range(0, 6)
+
+_behavior_cum_weights = [sum(BEHAVIOR_WEIGHTS[:i + 1]) for i in range(len(BEHAVIOR_WEIGHTS))]
+_behavior_probabilities = [weight / sum(BEHAVIOR_WEIGHTS) for weight in BEHAVIOR_WEIGHTS]
+
+_behavior_random = rng.stream(rng.BEHAVIOR)
+_baggage_random = rng.stream(rng.BAGGAGE)
+
+
+# Рандомизация поведения.
+def random_behavior():
+    return _behavior_random.choices(BEHAVIORS, cum_weights=_behavior_cum_weights)[0]
+
+
+# Рандомизация веса багажа.
+def random_baggage_weight():
+    return _baggage_random.randint(0, 5)
+
+
+# Веса поведений в порядке BEHAVIORS по смеси {Behavior: вес}. Поведения вне смеси не выбираются.
+def behavior_weights(mix):
+    weights = [mix.get(behavior, 0) for behavior in BEHAVIORS]
+    if any(weight < 0 for weight in weights) or not sum(weights):
+        raise ValueError("Смесь поведений должна содержать положительные веса.")
+    return weights
+
+
+# Пакетная рандомизация поведения для n пассажиров. weights - веса в порядке BEHAVIORS
+# (None - BEHAVIOR_WEIGHTS).
+def random_behaviors(n, weights=None):
+    if weights is None:
+        cum_weights, probabilities = _behavior_cum_weights, _behavior_probabilities
+    else:
+        cum_weights = list(itertools.accumulate(weights))
+        probabilities = [weight / cum_weights[-1] for weight in weights]
+
+    if np is not None:
+        indexes = _behavior_random.np_choice(len(BEHAVIORS), size=n, p=probabilities)
+        return [BEHAVIORS[i] for i in indexes.tolist()]
+
+    return _behavior_random.choices(BEHAVIORS, cum_weights=cum_weights, k=n)
+
+
+# Пакетная рандомизация веса багажа для n пассажиров.
+def random_baggage_weights(n):
+    if np is not None:
+        return _baggage_random.np_integers(BAGGAGE_WEIGHTS.start, BAGGAGE_WEIGHTS.stop, size=n).tolist()
+
+    return _baggage_random.choices(BAGGAGE_WEIGHTS, k=n)
+
+
+# Формирование строк новых пассажиров: поведение 'Все' даёт num_passengers пассажиров каждого типа,
+# 'Случайно' - случайное поведение, иначе название поведения из API переводится в код.
+# None вместо веса багажа - случайный вес.
+def generate_passengers(num_passengers, behavior, baggage_weight, action_ts):
+    if behavior == 'Все':
+        behaviors = [b for b in BEHAVIORS for _ in range(num_passengers)]
+    elif behavior == 'Случайно':
+        behaviors = random_behaviors(num_passengers)
+    else:
+        behaviors = [Behavior.from_label(behavior)] * num_passengers
+
+    if baggage_weight is None:
+        weights = random_baggage_weights(len(behaviors))
+    else:
+        weights = [baggage_weight] * len(behaviors)
+
+    return [(b, Status.SEARCHING, w, action_ts) for b, w in zip(behaviors, weights)]
+
+
+
+# Строки пассажиров, прибывающих в моменты action_times: время прибытия становится временем
+# первого действия. weights - веса поведений в порядке BEHAVIORS, None вместо веса багажа - случайный вес.
+def generate_arrivals(action_times, weights=None, baggage_weight=None):
+    behaviors = random_behaviors(len(action_times), weights)
+
+    if baggage_weight is None:
+        baggage_weights = random_baggage_weights(len(action_times))
+    else:
+        baggage_weights = [baggage_weight] * len(action_times)
+
+    return [(b, Status.SEARCHING, w, ts) for b, w, ts in zip(behaviors, baggage_weights, action_times)]
@@ -0,0 +1,105 @@
+import mmap
+import os
+import struct
+import threading
+from collections import namedtuple
+
+from statuses import Status
+
+try:
+    import numpy as np
+except ImportError:  # NumPy необязателен, без него файл читается через struct.
+    np = None
+
+JOURNAL_PATH = os.environ.get('PASSENGER_JOURNAL', 'transitions.journal')  # Пустая строка отключает журнал.
+
+# Запись журнала фиксированной длины (24 байта, little-endian): id пассажира, код прежнего
+# и нового статуса, модельное время и id рейса. Отсутствующие время и рейс записываются как -1.
+RECORD = struct.Struct('<IBBxxqq')
+NO_VALUE = -1
+
+if np is not None:
+    RECORD_DTYPE = np.dtype([('passenger_id', '<u4'), ('old_status', 'u1'), ('new_status', 'u1'), ('_pad', 'V2'),
+                             ('model_ts', '<i8'), ('flight_id', '<i8')])
+else:
+    RECORD_DTYPE = None
+
+Transition = namedtuple('Transition', 'passenger_id old_status new_status model_ts flight_id')
+
+
+def _flight_code(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return NO_VALUE
+
+
+# Двоичный журнал переходов: файл только дописывается, каждая пачка переходов
+# попадает в него одной записью на диск.
+class TransitionJournal:
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'ab') if path else None
+        if self._file is not None:
+            # Недописанная запись после аварийной остановки отрезается, чтобы не сбить выравнивание.
+            size = self._file.tell()
+            if size % RECORD.size:
+                self._file.truncate(size - size % RECORD.size)
+
+    # Переходы пассажиров [(passenger_id, flight_id)] из old_status в new_status (названия или коды).
+    def append(self, old_status, new_status, passengers, model_ts):
+        if self._file is None:
+            return
+
+        old_code = old_status if isinstance(old_status, int) else Status.from_label(old_status)
+        new_code = new_status if isinstance(new_status, int) else Status.from_label(new_status)
+        model_ts = NO_VALUE if model_ts is None else model_ts
+        data = b''.join(RECORD.pack(passenger_id, old_code, new_code, model_ts, _flight_code(flight_id))
+                        for passenger_id, flight_id in passengers)
+        if not data:
+            return
+
+        with self._lock:
+            self._file.write(data)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+# Последовательное чтение журнала частями по chunk_records записей.
+# Недописанная последняя запись (обрыв при аварийной остановке) пропускается.
+def read_journal(path=JOURNAL_PATH, chunk_records=4096):
+    with open(path, 'rb') as file:
+        while True:
+            chunk = file.read(RECORD.size * chunk_records)
+            usable = len(chunk) - len(chunk) % RECORD.size
+            for fields in RECORD.iter_unpack(chunk[:usable]):
+                yield Transition(*fields)
+            if len(chunk) < RECORD.size * chunk_records:
+                return
+
+
+# Отображение журнала в память для анализа. С NumPy возвращается структурированный массив
+# np.memmap с полями passenger_id, old_status, new_status, model_ts, flight_id, без него -
+# итератор по записям поверх mmap.
+def map_journal(path=JOURNAL_PATH):
+    count = os.path.getsize(path) // RECORD.size
+    if np is not None:
+        if not count:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        return np.memmap(path, dtype=RECORD_DTYPE, mode='r', shape=(count,))
+
+    return _iter_mapped(path, count)
+
+
+def _iter_mapped(path, count):
+    if not count:
+        return
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        for offset in range(0, count * RECORD.size, RECORD.size):
+            yield Transition(*RECORD.unpack_from(mapped, offset))
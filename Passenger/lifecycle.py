@@ -0,0 +1,165 @@
+from collections import namedtuple
+from enum import IntEnum
+
+import rng
+from model_time import manipulate_time, random_times
+from statuses import Behavior, Status
+
+
+# События жизненного цикла пассажира.
+class Event(IntEnum):
+    SEAT_ASSIGNED = 1  # Тикер нашёл пассажиру рейс со свободным местом.
+    NO_SEAT = 2  # Свободных мест на открытых рейсах не осталось.
+    DEPARTED = 3  # Время действия пассажира на борту наступило.
+    RESPONSE_TIMEOUT = 4  # Касса или регистрация не ответили за response_attempts попыток.
+    TICKET_BOUGHT = 5
+    TICKET_FAILED = 6
+    TICKET_RETURNED = 7
+    RETURN_FAILED = 8
+    CHECKED_IN = 9
+    CHECK_IN_FAILED = 10
+    CHECK_IN_OPENED = 11
+    CHECK_IN_CLOSED = 12
+    TRANSPORTED = 13
+    BOARDED = 14
+
+
+# Новое время действия после перехода.
+class Delay(IntEnum):
+    KEEP = 0  # Прежнее время действия.
+    NOW = 1  # Текущее модельное время.
+    PERIOD = 2  # Случайный момент в ближайшие period минут.
+    CHECK_IN = 3  # Случайный момент до конца регистрации, который записывается пассажиру.
+
+
+# Ветка перехода: новый статус (None - пассажир остаётся в прежнем), поведения, для которых ветка
+# действует (None - любые), вероятность выбора ветки (None - всегда), новое время действия,
+# освобождение места на рейсе и запись в текстовый журнал действий.
+Branch = namedtuple('Branch', 'target behaviors chance delay release_seat log',
+                    defaults=(None, None, Delay.KEEP, False, True))
+
+_RESPONSE_TIMEOUT = [Branch(Status.LEAVING, delay=Delay.NOW, release_seat=True)]
+
+# Таблица переходов {(статус, событие): ветки}. Ветки проверяются по порядку, выбирается первая,
+# подходящая по поведению и вероятности. Событие, которого нет в таблице для статуса пассажира, отклоняется.
+TRANSITIONS = {
+    (Status.SEARCHING, Event.SEAT_ASSIGNED): [
+        Branch(Status.RETURNING, (Behavior.FRAUD_OFFICE,), delay=Delay.PERIOD),
+        Branch(Status.WAITING_CHECK_IN, (Behavior.FRAUD_CHECK_IN,), delay=Delay.NOW),
+        Branch(Status.WAITING_PURCHASE, (Behavior.LATE_OFFICE,), delay=Delay.PERIOD),
+        Branch(Status.BUYING, delay=Delay.PERIOD),
+    ],
+    (Status.SEARCHING, Event.NO_SEAT): [Branch(Status.LEAVING, delay=Delay.NOW, log=False)],
+    (Status.ON_BOARD, Event.DEPARTED): [Branch(Status.LEAVING, delay=Delay.NOW, log=False)],
+
+    (Status.BUYING, Event.RESPONSE_TIMEOUT): _RESPONSE_TIMEOUT,
+    (Status.RETURNING, Event.RESPONSE_TIMEOUT): _RESPONSE_TIMEOUT,
+    (Status.CHECKING_IN, Event.RESPONSE_TIMEOUT): _RESPONSE_TIMEOUT,
+
+    (Status.BUYING, Event.TICKET_BOUGHT): [
+        Branch(Status.RETURNING, (Behavior.RETURN,), delay=Delay.PERIOD, log=False),
+        Branch(Status.WAITING_CHECK_IN, delay=Delay.NOW, log=False),
+    ],
+    # Место на рейсе, билет на который купить не удалось, освобождается,
+    # новый рейс со свободными местами назначается при обработке 'Поиск билета'.
+    (Status.BUYING, Event.TICKET_FAILED): [
+        Branch(Status.SEARCHING, chance=0.8, delay=Delay.NOW, release_seat=True),
+        Branch(Status.LEAVING, delay=Delay.NOW, release_seat=True),
+    ],
+    # После ответа кассы на возврат пассажир в любом случае покидает рейс.
+    (Status.RETURNING, Event.TICKET_RETURNED): [Branch(Status.LEAVING, release_seat=True)],
+    (Status.RETURNING, Event.RETURN_FAILED): [
+        Branch(Status.LEAVING, chance=0.7, release_seat=True),
+        Branch(Status.SEARCHING, release_seat=True),
+    ],
+    (Status.CHECKING_IN, Event.CHECKED_IN): [Branch(Status.BOARDING)],
+    (Status.CHECKING_IN, Event.CHECK_IN_FAILED): [Branch(Status.LEAVING, release_seat=True)],
+
+    (Status.WAITING_CHECK_IN, Event.CHECK_IN_OPENED): [
+        Branch(None, (Behavior.LATE_CHECK_IN,)),
+        Branch(Status.CHECKING_IN, delay=Delay.CHECK_IN, log=False),
+    ],
+    (Status.WAITING_PURCHASE, Event.CHECK_IN_OPENED): [Branch(Status.BUYING, log=False)],
+    (Status.WAITING_CHECK_IN, Event.CHECK_IN_CLOSED): [Branch(Status.CHECKING_IN, log=False)],
+
+    (Status.BOARDING, Event.TRANSPORTED): [Branch(Status.TRANSPORTING)],
+    (Status.TRANSPORTING, Event.BOARDED): [Branch(Status.ON_BOARD)],
+}
+
+
+# Результат применения события: переходы {(прежний статус, новый статус, log): [(passenger_id, flight_id)]}
+# для записи в журналы после фиксации транзакции и отклонённые пассажиры [(passenger_id, статус)].
+Outcome = namedtuple('Outcome', 'moved rejected')
+
+
+# Исполнитель переходов. Пассажиры события разбираются по веткам таблицы в памяти, а пассажиры,
+# переходящие в один статус, обновляются одним пакетом хранилища. Для отклонения недопустимого
+# перехода запросы не нужны: достаточно статуса, прочитанного вместе с пассажиром.
+class PassengerLifecycle:
+    def __init__(self, repository, release_seats, record, period, transitions=TRANSITIONS, random=None):
+        self.repository = repository
+        self.release_seats = release_seats  # Освобождение мест [flight_id].
+        self.record = record  # Запись переходов (old_status, new_status, [(passenger_id, flight_id)], model_ts, log).
+        self.period = period  # Минуты окна задержки Delay.PERIOD.
+        self.transitions = transitions
+        self.random = random or rng.stream(rng.LIFECYCLE)  # Поток для веток с chance.
+
+    # Выбор ветки для пассажира. None - событие для статуса недопустимо.
+    def branch(self, event, status, behavior):
+        branches = self.transitions.get((status, event))
+        if branches is None:
+            return None
+        for branch in branches:
+            if branch.behaviors is not None and behavior not in branch.behaviors:
+                continue
+            if branch.chance is not None and self.random.random() >= branch.chance:
+                continue
+            return branch
+        return None
+
+    # Применение события к пассажирам [(passenger_id, behavior, status, flight_id)] в модельное время now_ts.
+    # flight_id записывается пассажиру при переходе (None оставляет прежний рейс). check_in_end_ts - конец
+    # регистрации для задержки Delay.CHECK_IN. Внутри транзакции вызывающего обновления присоединяются к ней.
+    def apply(self, event, passengers, now_ts, check_in_end_ts=None):
+        groups = {}
+        rejected = []
+        for passenger_id, behavior, status, flight_id in passengers:
+            branch = self.branch(event, status, behavior)
+            if branch is None:
+                rejected.append((passenger_id, status))
+            elif branch.target is not None:
+                groups.setdefault((status, branch), []).append((passenger_id, flight_id))
+
+        updates = {}
+        released = []
+        moved = {}
+        for (status, branch), group in groups.items():
+            action_times = self._action_times(branch.delay, len(group), now_ts, check_in_end_ts)
+            with_check_in_end = branch.delay == Delay.CHECK_IN
+            updates.setdefault((branch.target, with_check_in_end), []).extend(
+                (action_ts, flight_id, passenger_id) for action_ts, (passenger_id, flight_id) in zip(action_times, group))
+            if branch.release_seat:
+                released.extend(flight_id for _, flight_id in group)
+            moved.setdefault((status, branch.target, branch.log), []).extend(group)
+
+        with self.repository.transaction():
+            for (target, with_check_in_end), rows in updates.items():
+                self.repository.update_passengers(target, rows,
+                                                  check_in_end_ts=check_in_end_ts if with_check_in_end else None)
+            if released:
+                self.release_seats(released)
+        return Outcome(moved, rejected)
+
+    def _action_times(self, delay, n, now_ts, check_in_end_ts):
+        if delay == Delay.KEEP or now_ts is None:
+            return [None] * n
+        if delay == Delay.NOW:
+            return [now_ts] * n
+        if delay == Delay.PERIOD:
+            return random_times(now_ts, manipulate_time(now_ts, '+', self.period), n)
+        return random_times(now_ts, check_in_end_ts, n)
+
+    # Запись переходов результата в журналы. Вызывается после фиксации транзакции.
+    def record_outcome(self, outcome, model_ts):
+        for (old_status, new_status, log), passengers in outcome.moved.items():
+            self.record(old_status, new_status, passengers, model_ts, log)
@@ -0,0 +1,104 @@
+import atexit
+import json
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Параметры журналов действий.
+LOG_FORMAT = os.environ.get('PASSENGER_LOG_FORMAT', 'text')  # 'text' или 'json' (JSON Lines).
+LOG_MAX_BYTES = int(os.environ.get('PASSENGER_LOG_MAX_BYTES', 10 * 1024 * 1024))  # Размер файла до ротации.
+LOG_BACKUP_COUNT = int(os.environ.get('PASSENGER_LOG_BACKUP_COUNT', 5))  # Число хранимых старых файлов.
+LOG_BATCH_SIZE = int(os.environ.get('PASSENGER_LOG_BATCH_SIZE', 256))  # Записей между сбросами буфера на диск.
+
+# Поля записи о смене статуса, передаваемые через extra.
+TRANSITION_FIELDS = ('passenger_id', 'old_status', 'new_status')
+
+
+# Запись в формате JSON Lines: время, журнал, сообщение и поля смены статуса, если они есть.
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {"time": self.formatTime(record), "logger": record.name, "message": record.getMessage()}
+        for field in TRANSITION_FIELDS:
+            if hasattr(record, field):
+                entry[field] = getattr(record, field)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+# Файл с ротацией по размеру, сбрасываемый на диск пакетами: после batch_size записей
+# или когда очередь журналов опустела.
+class BatchRotatingFileHandler(RotatingFileHandler):
+    def __init__(self, filename, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT, batch_size=LOG_BATCH_SIZE):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        self.batch_size = batch_size
+        self._pending = 0
+
+    # Вызывается StreamHandler.emit после каждой записи.
+    def flush(self):
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.flush_batch()
+
+    def flush_batch(self):
+        self._pending = 0
+        super().flush()
+
+    def close(self):
+        self.flush_batch()
+        super().close()
+
+
+# Слушатель очереди, сбрасывающий буферы файлов перед ожиданием новых записей.
+class BatchQueueListener(QueueListener):
+    def dequeue(self, block):
+        if block and self.queue.empty():
+            for handler in self.handlers:
+                handler.flush_batch()
+        return self.queue.get(block)
+
+
+# Все журналы пишутся одним фоновым потоком: вызов logger.info только кладёт запись в очередь.
+_queue = queue.SimpleQueue()
+_listener = None
+_handlers = []
+
+
+def get_logger(name, filename, log_format=LOG_FORMAT):
+    global _listener
+
+    handler = BatchRotatingFileHandler(filename)
+    if log_format == 'json':
+        handler.setFormatter(JsonLinesFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))  # noqa
+    handler.addFilter(logging.Filter(name))
+    _handlers.append(handler)
+
+    # Слушатель перезапускается, чтобы подхватить новый файл.
+    if _listener is not None:
+        _listener.stop()
+    _listener = BatchQueueListener(_queue, *_handlers)
+    _listener.start()
+
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(QueueHandler(_queue))
+    return logger
+
+
+def stop():
+    if _listener is not None:
+        _listener.stop()
+    for handler in _handlers:
+        handler.close()
+
+
+atexit.register(stop)
+
+
+# Запись о смене статуса пассажиров passenger_ids с old_status на new_status.
+def log_transitions(logger, old_status, new_status, passenger_ids):
+    for passenger_id in passenger_ids:
+        logger.info(f"Пассажир {passenger_id} изменил свой статус с '{old_status}' на '{new_status}'.",
+                    extra={'passenger_id': passenger_id, 'old_status': old_status, 'new_status': new_status})
@@ -0,0 +1,170 @@
+import bisect
+import math
+import threading
+
+# Границы корзин гистограмм по умолчанию.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # Секунды.
+LAG_BUCKETS = (0, 60, 300, 600, 1800, 3600, 3 * 3600, 6 * 3600, 24 * 3600)  # Секунды модельного времени.
+SIZE_BUCKETS = (1, 5, 10, 50, 100, 500, 1000, 5000, 10000)  # Записей в пакете.
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+# Метрика с набором меток: значения хранятся в словаре по кортежу меток,
+# изменение - одна операция под блокировкой.
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def _key(self, labels):
+        return tuple(labels.get(name, '') for name in self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = list(self._series.items())
+        for key, value in sorted(series, key=lambda item: tuple(map(str, item[0]))):
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key, value):
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"]
+
+
+# Монотонно растущий счётчик.
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    # Значение счётчика с метками labels; без меток - сумма по всем меткам.
+    def value(self, **labels):
+        with self._lock:
+            if not labels:
+                return sum(self._series.values())
+            return self._series.get(self._key(labels), 0)
+
+
+# Значение, которое может расти и убывать (например, число пассажиров в статусе).
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._series[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    # Замена всех значений: метки, которых нет в values {кортеж меток: значение}, исчезают.
+    def replace(self, values):
+        with self._lock:
+            self._series = dict(values)
+
+
+# Гистограмма с фиксированными корзинами: наблюдение - бинарный поиск корзины и три сложения.
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Счётчики корзин (последняя - +Inf), сумма и число наблюдений.
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _render_series(self, key, value):
+        counts, total, count = value[0][:], value[1], value[2]
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip((*self.buckets, math.inf), counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.labels, key, [('le', _format_value(bound))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labels, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+# Набор метрик модуля в порядке регистрации. Значения ведутся в процессе по мере событий,
+# поэтому выдача только форматирует их и не обращается к хранилищу.
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    # Текстовый формат Prometheus (text/plain; version=0.0.4).
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+passengers_by_status = registry.gauge('passenger_passengers', "Число пассажиров в статусе.", ('status',))
+transitions_total = registry.counter('passenger_transitions_total', "Число смен статуса пассажиров.",
+                                     ('old_status', 'new_status'))
+arrivals_total = registry.counter('passenger_arrivals_total', "Число пассажиров, созданных генератором прибытий.")
+tick_seconds = registry.histogram('passenger_tick_seconds', "Длительность обработки наступивших событий тикером.")
+dispatch_lag_seconds = registry.histogram('passenger_dispatch_lag_seconds',
+                                          "Отставание обработки от времени действия пассажира, модельные секунды.",
+                                          buckets=LAG_BUCKETS)
+outbound_seconds = registry.histogram('passenger_outbound_request_seconds',
+                                      "Длительность исходящих HTTP-запросов к внешним модулям.",
+                                      ('downstream', 'method', 'outcome'))
+db_transaction_seconds = registry.histogram('passenger_db_transaction_seconds',
+                                            "Длительность транзакций SQLite от начала до фиксации или отката.",
+                                            ('outcome',))
+callback_batch_size = registry.histogram('passenger_callback_batch_size', "Число записей в пакете ответа внешнего модуля.",
+                                         ('route',), buckets=SIZE_BUCKETS)
+callback_bytes = registry.histogram('passenger_callback_bytes', "Размер тела ответа внешнего модуля в байтах.",
+                                    ('route',), buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304))
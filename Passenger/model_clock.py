@@ -0,0 +1,59 @@
+import threading
+import time
+
+# Параметры часов модельного времени.
+RATE_SMOOTHING = 0.3  # Вес нового замера скорости в экспоненциальном сглаживании.
+MIN_RATE_WINDOW = 1.0  # Минимум секунд между замерами скорости, чтобы частые синхронизации не давали шум.
+
+
+# Часы модельного времени. Табло сообщает модельное время при синхронизации, а между синхронизациями
+# время экстраполируется локально по измеренной скорости (модельных секунд за секунду),
+# поэтому now() не обращается к сети и продолжает идти при кратковременной недоступности табло.
+class ModelClock:
+    def __init__(self, smoothing=RATE_SMOOTHING, min_rate_window=MIN_RATE_WINDOW):
+        self.smoothing = smoothing
+        self.min_rate_window = min_rate_window
+        self.rate = None  # Не измерена: до второй синхронизации время не экстраполируется.
+        self._lock = threading.Lock()
+        self._base = None  # (модельное время, monotonic) последней синхронизации.
+        self._sample = None  # Начало текущего окна замера скорости.
+
+    # Синхронизация с временем табло model_ts (секунды эпохи).
+    def sync(self, model_ts):
+        wall = time.monotonic()
+        with self._lock:
+            if self._sample is None or model_ts < self._sample[0]:
+                # Первая синхронизация или время табло пошло назад: замер начинается заново.
+                self._sample = (model_ts, wall)
+            elif wall - self._sample[1] >= self.min_rate_window:
+                measured = (model_ts - self._sample[0]) / (wall - self._sample[1])
+                self.rate = measured if self.rate is None else self.rate + self.smoothing * (measured - self.rate)
+                self._sample = (model_ts, wall)
+            self._base = (model_ts, wall)
+
+    # Текущее модельное время (None, пока табло ни разу не ответило).
+    def now(self):
+        with self._lock:
+            if self._base is None:
+                return None
+            model_ts, wall = self._base
+            if not self.rate:
+                return model_ts
+            return int(model_ts + (time.monotonic() - wall) * self.rate)
+
+    # Секунды с последней синхронизации (None, если её не было).
+    def age(self):
+        with self._lock:
+            return None if self._base is None else time.monotonic() - self._base[1]
+
+    # Секунды настенного времени до наступления модельного времени ts.
+    # None, если предсказать нельзя: время стоит или скорость ещё не измерена.
+    def wall_delay(self, ts):
+        now_ts = self.now()
+        if ts is None or now_ts is None:
+            return None
+        if ts <= now_ts:
+            return 0
+        if not self.rate:
+            return None
+        return (ts - now_ts) / self.rate
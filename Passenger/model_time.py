@@ -0,0 +1,85 @@
+import time
+from datetime import datetime, timezone
+
+import rng
+
+try:
+    import numpy as np
+except ImportError:  # NumPy необязателен, без него используется random.choices.
+    np = None
+
+# Модельное время внутри модуля хранится как целое число секунд эпохи (UTC).
+# В текст оно переводится только на границах: API табло и логи.
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+SECONDS_IN_DAY = 24 * 60 * 60
+
+_action_time_random = rng.stream(rng.ACTION_TIME)
+
+
+# Перевод времени в формат sqlite.
+def convert_to_sqlite_format(time_str):
+    dt_obj = datetime.strptime(time_str, "%m/%d/%Y %I:%M:%S %p")
+
+    return dt_obj.strftime(TIME_FORMAT)
+
+
+# Перевод времени табло в текстовый формат модуля.
+def table_convert(time_str):
+    return from_epoch(table_to_epoch(time_str))
+
+
+# Перевод времени табло ("2024-01-01T12:00:00.0000000") в секунды эпохи.
+def table_to_epoch(time_str):
+    time_str = time_str.strip().strip('"')
+    time_str = time_str.split('.')[0]
+
+    return to_epoch(time_str)
+
+
+# Перевод текстового времени ("2024-01-01 12:00:00" или ISO) в секунды эпохи.
+def to_epoch(time_str):
+    dt_obj = datetime.fromisoformat(time_str).replace(tzinfo=timezone.utc)
+
+    return int(dt_obj.timestamp())
+
+
+# Перевод секунд эпохи в текстовый формат модуля.
+def from_epoch(ts):
+    return time.strftime(TIME_FORMAT, time.gmtime(ts))
+
+
+# Вычисление времени действия пассажиров.
+def random_time(start, end):
+    if end < start:
+        end += -((end - start) // SECONDS_IN_DAY) * SECONDS_IN_DAY
+
+    minutes = (end - start) // 60
+
+    return start + _action_time_random.randrange(max(minutes, 1)) * 60
+
+
+# Пакетное вычисление n времён действия в окне [start, end) одним вызовом.
+def random_times(start, end, n):
+    if n <= 0:
+        return []
+
+    if end < start:
+        end += -((end - start) // SECONDS_IN_DAY) * SECONDS_IN_DAY
+
+    minutes = max((end - start) // 60, 1)
+
+    if np is not None:
+        return (start + _action_time_random.np_integers(0, minutes, size=n) * 60).tolist()
+
+    return [start + offset for offset in _action_time_random.choices(range(0, minutes * 60, 60), k=n)]
+
+
+# Вычисление границ временного действия.
+def manipulate_time(ts, operator, minutes):
+    if operator == '+':
+        return ts + minutes * 60
+    elif operator == '-':
+        return ts - minutes * 60
+
+    raise ValueError(f"Неизвестный оператор: {operator}")
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+# Параметры исходящих запросов к табло, кассе и регистрации.
+CONNECT_TIMEOUT = float(os.environ.get('PASSENGER_HTTP_CONNECT_TIMEOUT', 2))  # Секунды на установку соединения.
+READ_TIMEOUT = float(os.environ.get('PASSENGER_HTTP_READ_TIMEOUT', 10))  # Секунды на ожидание ответа.
+POOL_SIZE = int(os.environ.get('PASSENGER_HTTP_POOL_SIZE', 16))  # Соединений keep-alive на один хост.
+CHUNK_SIZE = int(os.environ.get('PASSENGER_OUTBOUND_CHUNK_SIZE', 500))  # Пассажиров в одном теле запроса.
+MAX_PARALLEL = int(os.environ.get('PASSENGER_OUTBOUND_WORKERS', 8))  # Одновременно отправляемых частей.
+RETRIES = int(os.environ.get('PASSENGER_OUTBOUND_RETRIES', 2))  # Повторов неудачной части.
+RETRY_DELAY = float(os.environ.get('PASSENGER_OUTBOUND_RETRY_DELAY', 0.5))  # Секунды до первого повтора, далее вдвое больше.
+
+
+# Внешний модуль, к которому обращается запрос: первый сегмент пути адреса.
+def downstream(url):
+    parts = urlsplit(url)
+    return parts.path.strip('/').split('/')[0] or parts.netloc
+
+
+# Клиент исходящих запросов: собственный цикл asyncio в фоновом потоке и общая
+# requests.Session с пулом keep-alive соединений. Блокирующие вызовы requests выполняются
+# в пуле потоков, поэтому пакеты к разным модулям уходят одновременно.
+class OutboundClient:
+    def __init__(self, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, pool_size=POOL_SIZE,
+                 chunk_size=CHUNK_SIZE, max_parallel=MAX_PARALLEL, retries=RETRIES, retry_delay=RETRY_DELAY):
+        self.timeout = (connect_timeout, read_timeout)
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='outbound')
+        self._loop = asyncio.new_event_loop()
+        self._workers = asyncio.Semaphore(max_parallel)
+        threading.Thread(target=self._loop.run_forever, name='outbound-loop', daemon=True).start()
+
+    # Запрос внутри цикла клиента. Ошибка HTTP-статуса считается неудачей запроса.
+    # Длительность учитывается по внешнему модулю - первому сегменту пути (dep-board, ticket-office, checkin).
+    async def request(self, method, url, **kwargs):
+        call = partial(self._session.request, method, url, timeout=self.timeout, **kwargs)
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            response = await self._loop.run_in_executor(self._executor, call)
+            response.raise_for_status()
+            outcome = 'ok'
+            return response
+        finally:
+            metrics.outbound_seconds.observe(time.perf_counter() - started, downstream=downstream(url), method=method,
+                                             outcome=outcome)
+
+    # Отправка одной части пакета с повторами. Во время паузы перед повтором
+    # место в пуле отправителей свободно для других частей.
+    async def post_chunk(self, url, chunk):
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._workers:
+                    return await self.request('POST', url, json=chunk)
+            except requests.RequestException:
+                if attempt == self.retries:
+                    raise
+            await asyncio.sleep(self.retry_delay * 2 ** attempt)
+
+    # Разбиение пакета на части по chunk_size и параллельная отправка частей.
+    # Возвращает по каждой части ответ или исключение последней попытки.
+    async def post_chunks(self, url, payload):
+        chunks = [payload[i:i + self.chunk_size] for i in range(0, len(payload), self.chunk_size)]
+        return await asyncio.gather(*(self.post_chunk(url, chunk) for chunk in chunks), return_exceptions=True)
+
+    # Выполнение сопрограммы в цикле клиента из обычного потока.
+    def run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def get(self, url, **kwargs):
+        return self.run(self.request('GET', url, **kwargs))
+
+    def post(self, url, json):
+        return self.run(self.request('POST', url, json=json))
+
+    # Одновременная отправка пакетов [(url, список записей)] частями.
+    # Возвращает по каждому пакету список результатов его частей.
+    def post_many(self, calls):
+        async def send():
+            return await asyncio.gather(*(self.post_chunks(url, payload) for url, payload in calls))
+
+        return self.run(send())
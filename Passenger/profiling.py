@@ -0,0 +1,135 @@
+import cProfile
+import itertools
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+# Параметры профилирования. Без PASSENGER_PROFILING замеры не ведутся, а span() возвращает
+# общий пустой контекст, поэтому накладные расходы - один вызов функции.
+ENABLED = os.environ.get('PASSENGER_PROFILING', '').lower() in ('1', 'true', 'yes')
+RECENT_SPANS = int(os.environ.get('PASSENGER_PROFILING_RECENT', 500))  # Последних замеров в отчёте.
+SAMPLES_PER_SPAN = int(os.environ.get('PASSENGER_PROFILING_SAMPLES', 2048))  # Замеров для перцентилей на один участок.
+CPROFILE_DIR = os.environ.get('PASSENGER_CPROFILE_DIR', '')  # Каталог дампов cProfile, пустая строка - выключено.
+CPROFILE_RATE = float(os.environ.get('PASSENGER_CPROFILE_RATE', 0.01))  # Доля профилируемых тиков и запросов.
+
+PERCENTILES = (50, 90, 99)
+
+_NULL = nullcontext()
+
+
+# Статистика участка: число и сумма замеров, максимум и последние SAMPLES_PER_SPAN длительностей.
+class _SpanStats:
+    def __init__(self, samples):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=samples)
+
+    def add(self, duration):
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.samples.append(duration)
+
+    def summary(self):
+        ordered = sorted(self.samples)
+        result = {"count": self.count, "total": self.total, "max": self.max,
+                  "mean": self.total / self.count if self.count else 0.0}
+        for percentile in PERCENTILES:
+            index = min(len(ordered) - 1, int(len(ordered) * percentile / 100))
+            result[f"p{percentile}"] = ordered[index] if ordered else 0.0
+        return result
+
+
+# Замеры участков горячего пути: последние замеры по порядку и агрегаты по имени участка.
+class Profiler:
+    def __init__(self, enabled=ENABLED, recent=RECENT_SPANS, samples=SAMPLES_PER_SPAN, cprofile_dir=CPROFILE_DIR,
+                 cprofile_rate=CPROFILE_RATE):
+        self.enabled = enabled
+        self.samples = samples
+        self.cprofile_dir = cprofile_dir
+        self.cprofile_rate = cprofile_rate
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=recent)
+        self._stats = {}
+        self._dumps = itertools.count(1)
+        self._cprofile_lock = threading.Lock()
+
+    def record(self, name, started, duration):
+        with self._lock:
+            self._recent.append((name, started, duration))
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = _SpanStats(self.samples)
+            stats.add(duration)
+
+    # Замер участка name. При выключенном профилировании - пустой контекст.
+    def span(self, name):
+        if not self.enabled:
+            return _NULL
+        return self._span(name)
+
+    @contextmanager
+    def _span(self, name):
+        started = time.time()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, started, time.perf_counter() - start)
+
+    # Выборочный дамп cProfile: с вероятностью cprofile_rate блок профилируется и сохраняется
+    # в cprofile_dir как <name>-<время>-<номер>.prof. Одновременно профилируется один блок:
+    # остальные в это время выполняются без профилировщика.
+    def sample(self, name):
+        if not self.cprofile_dir or random.random() >= self.cprofile_rate:
+            return _NULL
+        if not self._cprofile_lock.acquire(blocking=False):
+            return _NULL
+        return self._sample(name)
+
+    @contextmanager
+    def _sample(self, name):
+        profile = cProfile.Profile()
+        try:
+            try:
+                profile.enable()
+            except ValueError:  # Уже работает другой профилировщик.
+                yield
+                return
+            try:
+                yield
+            finally:
+                profile.disable()
+                os.makedirs(self.cprofile_dir, exist_ok=True)
+                filename = f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{next(self._dumps)}.prof"
+                profile.dump_stats(os.path.join(self.cprofile_dir, filename))
+        finally:
+            self._cprofile_lock.release()
+
+    # Отчёт: последние замеры и агрегаты с перцентилями по каждому участку (секунды).
+    def report(self, limit=None):
+        with self._lock:
+            recent = list(self._recent)
+            stats = {name: span_stats.summary() for name, span_stats in self._stats.items()}
+        if limit is not None:
+            recent = recent[-limit:] if limit > 0 else []
+        return {
+            "enabled": self.enabled,
+            "cprofile": {"dir": self.cprofile_dir or None, "rate": self.cprofile_rate},
+            "spans": [{"name": name, "started": started, "duration": duration} for name, started, duration in recent],
+            "stats": stats,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._recent.clear()
+            self._stats.clear()
+
+
+profiler = Profiler()
+span = profiler.span
+sample = profiler.sample
@@ -0,0 +1,112 @@
+import hashlib
+import os
+import random
+import threading
+
+try:
+    import numpy as np
+except ImportError:  # NumPy необязателен, без него используются только генераторы random.
+    np = None
+
+# Зерно симуляции. Пустая строка - недетерминированный режим (зерно из системного источника).
+# С одним и тем же зерном прогоны получают одинаковые последовательности случайных чисел в каждом
+# потоке; воспроизводимость всего прогона зависит ещё от порядка ответов внешних модулей.
+SEED = os.environ.get('PASSENGER_SEED', '')
+
+# Потоки случайных чисел подсистем. Отдельный поток на подсистему: изменение числа вызовов
+# в одной подсистеме не сдвигает последовательности остальных.
+BEHAVIOR = 'behavior'  # Поведение новых пассажиров.
+BAGGAGE = 'baggage'  # Вес багажа новых пассажиров.
+FLIGHTS = 'flights'  # Выбор рейса при покупке билета.
+LIFECYCLE = 'lifecycle'  # Вероятностные ветки переходов статусов.
+ACTION_TIME = 'action_time'  # Времена действий пассажиров.
+WORKLOAD = 'workload'  # Поток прибытий пассажиров по профилю нагрузки.
+
+
+def parse_seed(value):
+    if value is None or value == '':
+        return None
+    return int(value)
+
+
+# Зерно потока name, выведенное из общего зерна: 64 бита SHA-256 от "<seed>:<name>".
+def derive_seed(seed, name):
+    digest = hashlib.sha256(f"{seed}:{name}".encode()).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+# Поток случайных чисел подсистемы: генератор random и, если установлен NumPy, генератор NumPy
+# с зерном потока. Вызовы идут под блокировкой: генератор NumPy не потокобезопасен.
+class Stream:
+    def __init__(self, name, seed=None):
+        self.name = name
+        self._lock = threading.Lock()
+        self.seed(seed)
+
+    # Перезапуск потока с общим зерном seed (None - зерно из системного источника).
+    def seed(self, seed):
+        stream_seed = None if seed is None else derive_seed(seed, self.name)
+        with self._lock:
+            self._random = random.Random(stream_seed)
+            self._numpy = np.random.default_rng(stream_seed) if np is not None else None
+
+    def random(self):
+        with self._lock:
+            return self._random.random()
+
+    def randrange(self, stop):
+        with self._lock:
+            return self._random.randrange(stop)
+
+    def randint(self, a, b):
+        with self._lock:
+            return self._random.randint(a, b)
+
+    def choices(self, population, cum_weights=None, k=1):
+        with self._lock:
+            return self._random.choices(population, cum_weights=cum_weights, k=k)
+
+    def gauss(self, mu, sigma):
+        with self._lock:
+            return self._random.gauss(mu, sigma)
+
+    # Пакетные варианты на NumPy, доступны только если NumPy установлен.
+    def np_choice(self, n, size, p):
+        with self._lock:
+            return self._numpy.choice(n, size=size, p=p)
+
+    def np_integers(self, low, high, size):
+        with self._lock:
+            return self._numpy.integers(low, high, size=size, dtype=np.int64)
+
+    def np_poisson(self, lam):
+        with self._lock:
+            return self._numpy.poisson(lam)
+
+
+# Набор потоков с общим зерном. Потоки создаются при первом обращении и перезапускаются
+# все сразу при смене зерна, поэтому ссылки на них, взятые при импорте, остаются действительными.
+class Streams:
+    def __init__(self, seed=None):
+        self._lock = threading.Lock()
+        self._streams = {}
+        self.seed = seed
+
+    def get(self, name):
+        with self._lock:
+            stream = self._streams.get(name)
+            if stream is None:
+                stream = self._streams[name] = Stream(name, self.seed)
+            return stream
+
+    # Новый прогон с зерном seed: все потоки начинают последовательности заново.
+    def reseed(self, seed):
+        with self._lock:
+            self.seed = seed
+            for stream in self._streams.values():
+                stream.seed(seed)
+
+
+streams = Streams(parse_seed(SEED))
+stream = streams.get
+reseed = streams.reseed
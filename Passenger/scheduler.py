@@ -0,0 +1,69 @@
+import heapq
+import itertools
+import threading
+
+# Момент "сразу": события без времени действия выполняются при ближайшей обработке.
+IMMEDIATELY = float('-inf')
+
+
+# Планировщик событий пассажиров: куча (время действия, id) по модельному времени.
+# Хранилище сообщает в него о каждом назначенном времени действия, а тикер забирает
+# наступившие события и спит до следующего события, пробуждения или опроса табло.
+class EventScheduler:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._heap = []
+        self._seq = itertools.count()
+        self._now = None
+        self._woken = False
+
+    def __len__(self):
+        with self._cond:
+            return len(self._heap)
+
+    # Добавление событий (action_ts, passenger_id); action_ts=None - выполнить сразу.
+    def push(self, entries):
+        with self._cond:
+            wake = False
+            for action_ts, passenger_id in entries:
+                if action_ts is None:
+                    action_ts = IMMEDIATELY
+                heapq.heappush(self._heap, (action_ts, next(self._seq), passenger_id))
+                wake = wake or (self._now is not None and action_ts <= self._now)
+            if wake:
+                self._woken = True
+                self._cond.notify_all()
+
+    # Сдвиг модельного времени. При скачке вперёд все наступившие события
+    # забираются сразу, независимо от настенного времени.
+    def advance(self, now_ts):
+        with self._cond:
+            self._now = now_ts
+            if self._heap and self._heap[0][0] <= now_ts:
+                self._woken = True
+                self._cond.notify_all()
+
+    # id пассажиров, чьё время действия наступило к текущему модельному времени.
+    def pop_due(self):
+        with self._cond:
+            due = {}
+            while self._heap and self._now is not None and self._heap[0][0] <= self._now:
+                _, _, passenger_id = heapq.heappop(self._heap)
+                due[passenger_id] = None
+            return list(due)
+
+    def next_due(self):
+        with self._cond:
+            return self._heap[0][0] if self._heap else None
+
+    def wake(self):
+        with self._cond:
+            self._woken = True
+            self._cond.notify_all()
+
+    # Ожидание пробуждения не дольше timeout секунд.
+    def wait(self, timeout):
+        with self._cond:
+            if not self._woken:
+                self._cond.wait(timeout)
+            self._woken = False
@@ -0,0 +1,82 @@
+from enum import IntEnum
+
+
+# Коды статусов пассажира. Коды хранятся в столбце passengers.status и в двоичном журнале переходов,
+# поэтому существующие значения не меняются, новые статусы получают следующие номера.
+class Status(IntEnum):
+    UNKNOWN = 0
+    SEARCHING = 1
+    BUYING = 2
+    WAITING_PURCHASE = 3
+    RETURNING = 4
+    WAITING_CHECK_IN = 5
+    CHECKING_IN = 6
+    BOARDING = 7
+    TRANSPORTING = 8
+    ON_BOARD = 9
+    LEAVING = 10
+
+    # Название статуса, используемое в API и журналах.
+    @property
+    def label(self):
+        return STATUS_LABELS[self]
+
+    @classmethod
+    def from_label(cls, label):
+        return _STATUS_BY_LABEL.get(label, cls.UNKNOWN)
+
+
+STATUS_LABELS = {
+    Status.UNKNOWN: 'Неизвестно',
+    Status.SEARCHING: 'Поиск билета',
+    Status.BUYING: 'Покупка билета',
+    Status.WAITING_PURCHASE: 'Ожидание покупки билета',
+    Status.RETURNING: 'Возврат билета',
+    Status.WAITING_CHECK_IN: 'Ожидание регистрации',
+    Status.CHECKING_IN: 'Регистрация',
+    Status.BOARDING: 'На посадку',
+    Status.TRANSPORTING: 'Транспортировка',
+    Status.ON_BOARD: 'На борту',
+    Status.LEAVING: 'Удаление',
+}
+
+_STATUS_BY_LABEL = {label: status for status, label in STATUS_LABELS.items()}
+
+
+# Коды поведения пассажира.
+class Behavior(IntEnum):
+    UNKNOWN = 0
+    ORDINARY = 1
+    RETURN = 2
+    FRAUD_OFFICE = 3
+    FRAUD_CHECK_IN = 4
+    LATE_OFFICE = 5
+    LATE_CHECK_IN = 6
+
+    # Название поведения, используемое в API и журналах.
+    @property
+    def label(self):
+        return BEHAVIOR_LABELS[self]
+
+    @classmethod
+    def from_label(cls, label):
+        return _BEHAVIOR_BY_LABEL.get(label, cls.UNKNOWN)
+
+
+BEHAVIOR_LABELS = {
+    Behavior.UNKNOWN: 'Неизвестно',
+    Behavior.ORDINARY: 'Обычный',
+    Behavior.RETURN: 'Возврат',
+    Behavior.FRAUD_OFFICE: 'Мошенник касса',
+    Behavior.FRAUD_CHECK_IN: 'Мошенник регистрация',
+    Behavior.LATE_OFFICE: 'Опоздавший касса',
+    Behavior.LATE_CHECK_IN: 'Опоздавший регистрация',
+}
+
+_BEHAVIOR_BY_LABEL = {label: behavior for behavior, label in BEHAVIOR_LABELS.items()}
+
+
+# Выражение SQL CASE, переводящее текстовый столбец column в коды перечисления labels {код: название}.
+def label_case(column, labels):
+    whens = ' '.join(f"WHEN '{label}' THEN {int(code)}" for code, label in labels.items() if code)
+    return f"CASE {column} {whens} ELSE 0 END"
@@ -0,0 +1,508 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+from db import DB_PATH, acquire, release, fetch_in, update_passengers, connect
+from flight_index import flight_key
+
+# Хранилище состояния пассажиров и рейсов: 'sqlite' (по умолчанию) или 'memory'.
+STORAGE_ENGINE = os.environ.get('PASSENGER_STORAGE', 'sqlite')
+SNAPSHOT_INTERVAL = int(os.environ.get('PASSENGER_SNAPSHOT_INTERVAL', 60))  # Секунды между снимками памяти в SQLite.
+
+PASSENGER_COLUMNS = "id, behavior, status, action_ts, flight_id, baggage_weight"
+
+
+# Интерфейс хранилища. Строка пассажира во всех выборках:
+# (id, behavior, status, action_ts, flight_id, baggage_weight). Поведение и статус хранятся
+# целочисленными кодами statuses.Behavior и statuses.Status.
+class PassengerRepository:
+    def __init__(self):
+        self._local = threading.local()
+        # Получатель назначенных времён действия [(action_ts, passenger_id)], обычно планировщик.
+        # Вызывается после фиксации транзакции, чтобы тикер не прочитал незафиксированное состояние.
+        self.on_schedule = None
+
+    def _schedule(self, entries):
+        if getattr(self._local, 'depth', 0):
+            self._local.pending.extend(entries)
+        elif self.on_schedule is not None:
+            self.on_schedule(list(entries))
+
+    # Учёт вложенности транзакций. _end_transaction возвращает True для внешней транзакции.
+    def _begin_transaction(self):
+        depth = getattr(self._local, 'depth', 0)
+        if not depth:
+            self._local.pending = []
+        self._local.depth = depth + 1
+        return depth
+
+    def _end_transaction(self, depth, committed):
+        self._local.depth = depth
+        if depth:
+            return
+        pending, self._local.pending = self._local.pending, []
+        if committed and pending and self.on_schedule is not None:
+            self.on_schedule(pending)
+
+    # Транзакция: изменения внутри блока with фиксируются вместе. Вложенные транзакции
+    # присоединяются к внешней.
+    def transaction(self):
+        raise NotImplementedError
+
+    # Вставка пассажиров (behavior, status, baggage_weight, action_ts), возвращает id новых пассажиров по порядку строк.
+    def insert_passengers(self, rows):
+        raise NotImplementedError
+
+    # Назначение времени действия пассажирам, созданным до получения модельного времени.
+    def schedule_unset(self, now_ts):
+        raise NotImplementedError
+
+    # Все назначенные времена действия [(action_ts, passenger_id)] для заполнения планировщика при старте.
+    def scheduled(self):
+        raise NotImplementedError
+
+    # Пассажиры по списку id.
+    def passengers(self, ids):
+        raise NotImplementedError
+
+    # Перевод группы пассажиров в статус. Строки: (action_ts, flight_id, passenger_id),
+    # None оставляет прежнее значение. check_in_end_ts, если задано, записывается всей группе.
+    def update_passengers(self, status, rows, check_in_end_ts=None):
+        raise NotImplementedError
+
+    # Отметка об отправке пассажиров в статусе status внешнему модулю: число попыток растёт,
+    # а время действия переносится на retry_ts, чтобы повторная отправка случилась только после
+    # таймаута. Возвращает {id: число попыток} для пассажиров, всё ещё находившихся в этом статусе.
+    def mark_awaiting(self, status, ids, retry_ts):
+        raise NotImplementedError
+
+    # Пассажиры рейса в указанном статусе.
+    def flight_passengers(self, flight_id, status):
+        raise NotImplementedError
+
+    # Удаление всех пассажиров в статусе. Возвращает рейсы удалённых пассажиров [flight_id]
+    # (None - без рейса), чтобы вызывающий мог освободить занятые ими места.
+    def delete_by_status(self, status):
+        raise NotImplementedError
+
+    # Число пассажиров по статусам {статус: число}.
+    def status_counts(self):
+        raise NotImplementedError
+
+    # Удаление всех пассажиров и рейсов.
+    def clear(self):
+        raise NotImplementedError
+
+    # Добавление рейса. capacity - число мест (None - без ограничения).
+    def add_flight(self, flight_id, airplane_id, capacity=None):
+        raise NotImplementedError
+
+    # Рейсы, на которые ещё не началась регистрация: [(flight_id, capacity, occupied)]
+    # для заполнения индекса открытых рейсов.
+    def open_flights(self):
+        raise NotImplementedError
+
+    # Изменение числа занятых мест: {flight_id: приращение}.
+    def change_occupancy(self, deltas):
+        raise NotImplementedError
+
+    def start_check_in(self, flight_id, check_in_end_ts):
+        raise NotImplementedError
+
+    def remove_flight(self, flight_id):
+        raise NotImplementedError
+
+
+class SQLiteRepository(PassengerRepository):
+    # Длительность внешней транзакции (от начала до фиксации или отката) попадает в метрики.
+    @contextmanager
+    def transaction(self):
+        conn = acquire()
+        depth = self._begin_transaction()
+        started = time.perf_counter()
+        committed = False
+        try:
+            yield conn.cursor()
+            if not depth:
+                conn.commit()
+            committed = True
+        except BaseException:
+            if not depth:
+                conn.rollback()
+            raise
+        finally:
+            if not depth:
+                metrics.db_transaction_seconds.observe(time.perf_counter() - started,
+                                                       outcome='commit' if committed else 'rollback')
+            self._end_transaction(depth, committed)
+            release(conn)
+
+    def insert_passengers(self, rows):
+        with self.transaction() as c:
+            c.executemany("INSERT INTO passengers (behavior, status, baggage_weight, action_ts) VALUES (?, ?, ?, ?)",
+                          rows)
+            # Внутри одной транзакции новые rowid идут подряд до last_insert_rowid().
+            last_id = c.execute("SELECT last_insert_rowid()").fetchone()[0]
+            first_id = last_id - len(rows) + 1
+            self._schedule((row[3], first_id + i) for i, row in enumerate(rows) if row[3] is not None)
+        return list(range(first_id, last_id + 1))
+
+    def schedule_unset(self, now_ts):
+        with self.transaction() as c:
+            c.execute("SELECT id FROM passengers WHERE action_ts IS NULL")
+            ids = [row[0] for row in c.fetchall()]
+            c.execute("UPDATE passengers set action_ts = ? where action_ts IS NULL", (now_ts,))
+            self._schedule((now_ts, passenger_id) for passenger_id in ids)
+
+    def scheduled(self):
+        with self.transaction() as c:
+            c.execute("SELECT action_ts, id FROM passengers WHERE action_ts IS NOT NULL")
+            return c.fetchall()
+
+    def passengers(self, ids):
+        with self.transaction() as c:
+            return fetch_in(c, f"SELECT {PASSENGER_COLUMNS} FROM passengers WHERE id IN ({{placeholders}})", list(ids))
+
+    def update_passengers(self, status, rows, check_in_end_ts=None):
+        with self.transaction() as c:
+            update_passengers(c, status, rows)
+            if check_in_end_ts is not None:
+                c.executemany("UPDATE passengers SET check_in_end_ts = ? WHERE id = ?",
+                              [(check_in_end_ts, row[2]) for row in rows])
+            self._schedule((action_ts, passenger_id) for action_ts, _, passenger_id in rows)
+
+    def mark_awaiting(self, status, ids, retry_ts):
+        with self.transaction() as c:
+            c.executemany("UPDATE passengers SET attempts = attempts + 1, action_ts = ? WHERE id = ? AND status = ?",
+                          [(retry_ts, passenger_id, status) for passenger_id in ids])
+            attempts = dict(fetch_in(c, "SELECT id, attempts FROM passengers WHERE status = ? AND id IN ({placeholders})",
+                                     list(ids), (status,)))
+            self._schedule((retry_ts, passenger_id) for passenger_id in attempts)
+            return attempts
+
+    def flight_passengers(self, flight_id, status):
+        with self.transaction() as c:
+            c.execute(f"SELECT {PASSENGER_COLUMNS} FROM passengers WHERE flight_id = ? and status = ?",
+                      (str(flight_id), status))
+            return c.fetchall()
+
+    def delete_by_status(self, status):
+        with self.transaction() as c:
+            c.execute("DELETE FROM passengers WHERE status = ? RETURNING flight_id", (status,))
+            return [row[0] for row in c.fetchall()]
+
+    def status_counts(self):
+        with self.transaction() as c:
+            c.execute("SELECT status, COUNT(*) FROM passengers GROUP BY status")
+            return dict(c.fetchall())
+
+    def clear(self):
+        with self.transaction() as c:
+            c.execute('DELETE FROM passengers')
+            c.execute('DELETE FROM flights')
+
+    def add_flight(self, flight_id, airplane_id, capacity=None):
+        with self.transaction() as c:
+            c.execute('insert into flights (flight_id, airplane_id, is_check_in, capacity) VALUES (?, ?, 0, ?)',
+                      (flight_id, airplane_id, capacity))
+
+    def open_flights(self):
+        with self.transaction() as c:
+            c.execute("SELECT flight_id, capacity, occupied FROM flights WHERE is_check_in = '0'")
+            return c.fetchall()
+
+    def change_occupancy(self, deltas):
+        with self.transaction() as c:
+            c.executemany("UPDATE flights SET occupied = MAX(occupied + ?, 0) WHERE flight_id = ?",
+                          [(delta, flight_id) for flight_id, delta in deltas.items()])
+
+    def start_check_in(self, flight_id, check_in_end_ts):
+        with self.transaction() as c:
+            c.execute('update flights set is_check_in=1, check_in_end_ts = ? where flight_id=?',
+                      (check_in_end_ts, flight_id))
+
+    def remove_flight(self, flight_id):
+        with self.transaction() as c:
+            c.execute('delete from flights where flight_id = ?', (flight_id,))
+
+
+# Хранилище в памяти: словари пассажиров по статусу и по (рейс, статус). Очередь по времени действия
+# ведёт планировщик, которому хранилище сообщает о каждом назначенном времени. Изменения применяются сразу,
+# а внешняя транзакция запоминает прежние значения затронутых пассажиров и рейсов и при исключении
+# восстанавливает их. Состояние периодически сохраняется снимком в SQLite и загружается из него при старте.
+class MemoryRepository(PassengerRepository):
+    # Поля пассажира.
+    BEHAVIOR, STATUS, BAGGAGE_WEIGHT, ACTION_TS, FLIGHT_ID, CHECK_IN_END_TS, ATTEMPTS = range(7)
+
+    def __init__(self, snapshot_path=DB_PATH, snapshot_interval=SNAPSHOT_INTERVAL):
+        super().__init__()
+        self._lock = threading.RLock()
+        self._passengers = {}
+        self._by_status = {}
+        self._by_flight_status = {}
+        self._unset = set()
+        self._flights = {}
+        self._next_id = 1
+        self._saved_passengers = None  # {id: прежние поля или None} внешней транзакции.
+        self._saved_flights = None  # {рейс: прежние поля или None} внешней транзакции.
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+
+    # Как и в SQLite, откатывается только внешняя транзакция: исключение, перехваченное внутри неё,
+    # изменений не отменяет.
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            depth = self._begin_transaction()
+            if not depth:
+                self._saved_passengers, self._saved_flights = {}, {}
+            committed = False
+            try:
+                yield None
+                committed = True
+            except BaseException:
+                if not depth:
+                    self._rollback()
+                raise
+            finally:
+                if not depth:
+                    self._saved_passengers = self._saved_flights = None
+                self._end_transaction(depth, committed)
+
+    # Запоминание прежнего состояния пассажира и рейса перед первым изменением во внешней транзакции.
+    def _save_passenger(self, passenger_id):
+        if self._saved_passengers is not None and passenger_id not in self._saved_passengers:
+            passenger = self._passengers.get(passenger_id)
+            self._saved_passengers[passenger_id] = None if passenger is None else list(passenger)
+
+    def _save_flight(self, key):
+        if self._saved_flights is not None and key not in self._saved_flights:
+            flight = self._flights.get(key)
+            self._saved_flights[key] = None if flight is None else list(flight)
+
+    def _rollback(self):
+        for passenger_id, saved in self._saved_passengers.items():
+            passenger = self._passengers.pop(passenger_id, None)
+            if passenger is not None:
+                self._unindex(passenger_id, passenger)
+            if saved is not None:
+                self._passengers[passenger_id] = saved
+                self._index(passenger_id, saved)
+        for key, saved in self._saved_flights.items():
+            if saved is None:
+                self._flights.pop(key, None)
+            else:
+                self._flights[key] = saved
+
+    # Добавление пассажира во вспомогательные индексы.
+    def _index(self, passenger_id, passenger):
+        status, flight_id = passenger[self.STATUS], passenger[self.FLIGHT_ID]
+        self._by_status.setdefault(status, set()).add(passenger_id)
+        self._by_flight_status.setdefault((flight_id, status), set()).add(passenger_id)
+        if passenger[self.ACTION_TS] is None:
+            self._unset.add(passenger_id)
+
+    def _unindex(self, passenger_id, passenger):
+        status, flight_id = passenger[self.STATUS], passenger[self.FLIGHT_ID]
+        self._by_status.get(status, set()).discard(passenger_id)
+        self._by_flight_status.get((flight_id, status), set()).discard(passenger_id)
+        self._unset.discard(passenger_id)
+
+    def _row(self, passenger_id):
+        p = self._passengers[passenger_id]
+        return passenger_id, p[self.BEHAVIOR], p[self.STATUS], p[self.ACTION_TS], p[self.FLIGHT_ID], p[self.BAGGAGE_WEIGHT]
+
+    def insert_passengers(self, rows):
+        ids = []
+        with self.transaction():
+            for behavior, status, baggage_weight, action_ts in rows:
+                passenger_id = self._next_id
+                self._next_id += 1
+                self._save_passenger(passenger_id)
+                passenger = [behavior, status, baggage_weight, action_ts, None, None, 0]
+                self._passengers[passenger_id] = passenger
+                self._index(passenger_id, passenger)
+                if action_ts is not None:
+                    self._schedule([(action_ts, passenger_id)])
+                ids.append(passenger_id)
+        return ids
+
+    def schedule_unset(self, now_ts):
+        with self.transaction():
+            for passenger_id in self._unset:
+                self._save_passenger(passenger_id)
+                self._passengers[passenger_id][self.ACTION_TS] = now_ts
+            self._schedule((now_ts, passenger_id) for passenger_id in self._unset)
+            self._unset.clear()
+
+    def scheduled(self):
+        with self._lock:
+            return [(passenger[self.ACTION_TS], passenger_id) for passenger_id, passenger in self._passengers.items()
+                    if passenger[self.ACTION_TS] is not None]
+
+    def passengers(self, ids):
+        with self._lock:
+            return [self._row(passenger_id) for passenger_id in ids if passenger_id in self._passengers]
+
+    def update_passengers(self, status, rows, check_in_end_ts=None):
+        with self.transaction():
+            self._schedule((action_ts, passenger_id) for action_ts, _, passenger_id in rows
+                           if passenger_id in self._passengers)
+            for action_ts, flight_id, passenger_id in rows:
+                passenger = self._passengers.get(passenger_id)
+                if passenger is None:
+                    continue
+
+                self._save_passenger(passenger_id)
+                self._unindex(passenger_id, passenger)
+                passenger[self.STATUS] = status
+                if action_ts is not None:
+                    passenger[self.ACTION_TS] = action_ts
+                if flight_id is not None:
+                    passenger[self.FLIGHT_ID] = str(flight_id)
+                if check_in_end_ts is not None:
+                    passenger[self.CHECK_IN_END_TS] = check_in_end_ts
+                passenger[self.ATTEMPTS] = 0
+
+                self._by_status.setdefault(status, set()).add(passenger_id)
+                self._by_flight_status.setdefault((passenger[self.FLIGHT_ID], status), set()).add(passenger_id)
+                if passenger[self.ACTION_TS] is None:
+                    self._unset.add(passenger_id)
+
+    def mark_awaiting(self, status, ids, retry_ts):
+        with self.transaction():
+            attempts = {}
+            for passenger_id in ids:
+                passenger = self._passengers.get(passenger_id)
+                if passenger is None or passenger[self.STATUS] != status:
+                    continue
+
+                self._save_passenger(passenger_id)
+                passenger[self.ATTEMPTS] += 1
+                passenger[self.ACTION_TS] = retry_ts
+                attempts[passenger_id] = passenger[self.ATTEMPTS]
+            self._schedule((retry_ts, passenger_id) for passenger_id in attempts)
+            return attempts
+
+    def flight_passengers(self, flight_id, status):
+        with self._lock:
+            return [self._row(passenger_id) for passenger_id in self._by_flight_status.get((str(flight_id), status), ())]
+
+    def delete_by_status(self, status):
+        with self._lock:
+            flight_ids = []
+            for passenger_id in list(self._by_status.get(status, ())):
+                self._save_passenger(passenger_id)
+                passenger = self._passengers.pop(passenger_id)
+                self._unindex(passenger_id, passenger)
+                flight_ids.append(passenger[self.FLIGHT_ID])
+            return flight_ids
+
+    def status_counts(self):
+        with self._lock:
+            return {status: len(ids) for status, ids in self._by_status.items() if ids}
+
+    def clear(self):
+        with self._lock:
+            for passenger_id in self._passengers:
+                self._save_passenger(passenger_id)
+            for key in self._flights:
+                self._save_flight(key)
+            self._passengers.clear()
+            self._by_status.clear()
+            self._by_flight_status.clear()
+            self._unset.clear()
+            self._flights.clear()
+
+    def add_flight(self, flight_id, airplane_id, capacity=None):
+        with self._lock:
+            self._save_flight(flight_key(flight_id))
+            self._flights[flight_key(flight_id)] = [airplane_id, 0, None, capacity, 0]
+
+    def open_flights(self):
+        with self._lock:
+            return [(flight_id, flight[3], flight[4]) for flight_id, flight in self._flights.items() if not flight[1]]
+
+    def change_occupancy(self, deltas):
+        with self._lock:
+            for flight_id, delta in deltas.items():
+                flight = self._flights.get(flight_key(flight_id))
+                if flight is not None:
+                    self._save_flight(flight_key(flight_id))
+                    flight[4] = max(flight[4] + delta, 0)
+
+    def start_check_in(self, flight_id, check_in_end_ts):
+        with self._lock:
+            flight = self._flights.get(flight_key(flight_id))
+            if flight is not None:
+                self._save_flight(flight_key(flight_id))
+                flight[1] = 1
+                flight[2] = check_in_end_ts
+
+    def remove_flight(self, flight_id):
+        with self._lock:
+            self._save_flight(flight_key(flight_id))
+            self._flights.pop(flight_key(flight_id), None)
+
+    # Загрузка состояния из снимка SQLite.
+    def load(self):
+        conn = connect(self.snapshot_path)
+        try:
+            passengers = conn.execute("SELECT id, behavior, status, baggage_weight, action_ts, flight_id, "
+                                      "check_in_end_ts, attempts FROM passengers").fetchall()
+            flights = conn.execute("SELECT flight_id, airplane_id, is_check_in, check_in_end_ts, capacity, occupied "
+                                   "FROM flights").fetchall()
+        finally:
+            conn.close()
+
+        with self._lock:
+            self.clear()
+            for passenger_id, *fields in passengers:
+                self._passengers[passenger_id] = fields
+                self._index(passenger_id, fields)
+                self._next_id = max(self._next_id, passenger_id + 1)
+            for flight_id, *fields in flights:
+                self._flights[flight_key(flight_id)] = fields
+
+    # Сохранение снимка состояния в SQLite. Копия берётся под блокировкой, запись идёт без неё.
+    def snapshot(self):
+        with self._lock:
+            passengers = [(passenger_id, *fields) for passenger_id, fields in self._passengers.items()]
+            flights = [(flight_id, *fields) for flight_id, fields in self._flights.items()]
+
+        conn = connect(self.snapshot_path)
+        try:
+            conn.execute("DELETE FROM passengers")
+            conn.executemany("INSERT INTO passengers (id, behavior, status, baggage_weight, action_ts, flight_id, "
+                             "check_in_end_ts, attempts) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", passengers)
+            conn.execute("DELETE FROM flights")
+            conn.executemany("INSERT INTO flights (flight_id, airplane_id, is_check_in, check_in_end_ts, capacity, "
+                             "occupied) VALUES (?, ?, ?, ?, ?, ?)", flights)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def snapshot_thread(self):
+        while True:
+            time.sleep(self.snapshot_interval)
+            try:
+                self.snapshot()
+            except Exception as e:  # noqa
+                print(f"{time.strftime('%H:%M:%S', time.localtime())} - Не удалось сохранить снимок состояния: {e}")
+
+
+def create_repository(engine=STORAGE_ENGINE):
+    if engine == 'memory':
+        repository = MemoryRepository()
+        repository.load()
+        threading.Thread(target=repository.snapshot_thread, daemon=True).start()
+        return repository
+    if engine == 'sqlite':
+        return SQLiteRepository()
+
+    raise ValueError(f"Неизвестное хранилище: {engine}")
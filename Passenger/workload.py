@@ -0,0 +1,221 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+import metrics
+import rng
+from generation import BEHAVIORS, behavior_weights, generate_arrivals
+from model_time import SECONDS_IN_DAY
+from statuses import Behavior
+
+try:
+    import numpy as np
+except ImportError:  # NumPy необязателен, без него число прибытий считается на random.
+    np = None
+
+# Параметры генерации прибытий.
+LOOKAHEAD = int(os.environ.get('PASSENGER_WORKLOAD_LOOKAHEAD', 10))  # Минуты модельного времени, вставляемые заранее.
+IDLE_WAIT = 3  # Наибольшая пауза потока генерации в секундах: часы модели могут сменить скорость.
+POISSON_NORMAL_THRESHOLD = 30  # Среднее, начиная с которого пуассоновское число берётся из нормального приближения.
+
+# Суточные кривые: множители интенсивности по часам модельного времени (UTC).
+FLAT = (1.0,) * 24
+AIRPORT_DIURNAL = (0.15, 0.1, 0.1, 0.1, 0.2, 0.6, 1.4, 1.9, 2.0, 1.6, 1.2, 1.0,
+                   1.0, 1.0, 1.1, 1.3, 1.6, 1.8, 1.7, 1.4, 1.0, 0.7, 0.4, 0.25)
+
+# Профиль нагрузки:
+#   rate - прибытий в модельный час при множителе 1;
+#   diurnal - 24 множителя интенсивности по часам суток;
+#   behavior_mix - смесь поведений {Behavior: вес}, None - BEHAVIOR_WEIGHTS;
+#   baggage_weight - вес багажа всех пассажиров, None - случайный;
+#   burst_per_seat - дополнительных прибытий на место рейса, открытого для покупки билетов;
+#   burst_size - дополнительных прибытий к рейсу без ограничения вместимости;
+#   burst_window - минуты, по которым всплеск к рейсу распределяется равномерно.
+Profile = namedtuple('Profile', 'rate diurnal behavior_mix baggage_weight burst_per_seat burst_size burst_window',
+                     defaults=(FLAT, None, None, 0, 0, 60))
+
+PROFILES = {
+    'flat': Profile(rate=600),
+    'airport': Profile(rate=600, diurnal=AIRPORT_DIURNAL, burst_per_seat=0.5, burst_size=50, burst_window=120),
+}
+
+
+# Профиль, равный прежней пакетной генерации: в среднем num_passengers пассажиров за interval секунд
+# модельного времени. Поведение 'Все' - равная смесь и num_passengers пассажиров каждого типа.
+def batch_profile(num_passengers, interval, behavior, baggage_weight):
+    rate = num_passengers * 3600 / interval
+    if behavior in (None, 'Случайно'):
+        mix = None
+    elif behavior == 'Все':
+        mix = {b: 1 for b in BEHAVIORS}
+        rate *= len(BEHAVIORS)
+    else:
+        if Behavior.from_label(behavior) == Behavior.UNKNOWN:
+            raise ValueError(f"Неизвестное поведение '{behavior}'.")
+        mix = {Behavior.from_label(behavior): 1}
+    return Profile(rate=rate, behavior_mix=mix, baggage_weight=baggage_weight)
+
+
+# Профиль из API: название из PROFILES или объект с полями Profile поверх профиля base (по умолчанию 'flat').
+# diurnal - список из 24 множителей или название кривой ('flat', 'airport'), behavior_mix - {название поведения: вес}.
+def parse_profile(data):
+    if isinstance(data, str):
+        data = {"base": data}
+    if not isinstance(data, dict):
+        raise ValueError("Профиль нагрузки должен быть названием или объектом.")
+
+    base = PROFILES.get(data.get('base', 'flat'))
+    if base is None:
+        raise ValueError(f"Неизвестный профиль нагрузки '{data.get('base')}'.")
+
+    values = {}
+    for name in ('rate', 'burst_per_seat', 'burst_size', 'burst_window'):
+        if data.get(name) is not None:
+            values[name] = float(data[name])
+            if values[name] < 0:
+                raise ValueError(f"Параметр '{name}' не может быть отрицательным.")
+
+    diurnal = data.get('diurnal')
+    if isinstance(diurnal, str):
+        diurnal = {'flat': FLAT, 'airport': AIRPORT_DIURNAL}.get(diurnal)
+        if diurnal is None:
+            raise ValueError(f"Неизвестная суточная кривая '{data['diurnal']}'.")
+    if diurnal is not None:
+        if len(diurnal) != 24 or any(float(multiplier) < 0 for multiplier in diurnal):
+            raise ValueError("Суточная кривая - 24 неотрицательных множителя.")
+        values['diurnal'] = tuple(float(multiplier) for multiplier in diurnal)
+
+    if data.get('behavior_mix') is not None:
+        mix = {}
+        for label, weight in data['behavior_mix'].items():
+            behavior = Behavior.from_label(label)
+            if behavior == Behavior.UNKNOWN:
+                raise ValueError(f"Неизвестное поведение '{label}'.")
+            mix[behavior] = float(weight)
+        behavior_weights(mix)
+        values['behavior_mix'] = mix
+
+    if data.get('baggage_weight') is not None:
+        values['baggage_weight'] = int(data['baggage_weight'])
+
+    return base._replace(**values)
+
+
+# Пуассоновское число со средним lam из потока random.
+def poisson(random, lam):
+    if lam <= 0:
+        return 0
+    if lam >= POISSON_NORMAL_THRESHOLD:
+        return max(0, round(random.gauss(lam, math.sqrt(lam))))
+    limit = math.exp(-lam)
+    count = 0
+    product = random.random()
+    while product > limit:
+        count += 1
+        product *= random.random()
+    return count
+
+
+# Генератор прибытий по профилю: неоднородный пуассоновский поток с шагом в модельную минуту.
+# Интенсивность минуты - rate профиля с множителем часа суток плюс активные всплески к рейсам.
+class ArrivalGenerator:
+    def __init__(self, profile, random=None):
+        self.profile = profile
+        self.random = random or rng.stream(rng.WORKLOAD)
+        self._weights = None if profile.behavior_mix is None else behavior_weights(profile.behavior_mix)
+        self._lock = threading.Lock()
+        self._bursts = []  # (начало, конец, прибытий в минуту).
+
+    # Всплеск прибытий к рейсу, открытому для покупки билетов в модельное время ts.
+    def flight_opened(self, ts, capacity=None):
+        size = self.profile.burst_size if capacity is None else self.profile.burst_per_seat * capacity
+        window = self.profile.burst_window
+        if ts is None or size <= 0 or window <= 0:
+            return
+        with self._lock:
+            self._bursts.append((ts, ts + int(window * 60), size / window))
+
+    # Среднее число прибытий за модельную минуту, начинающуюся в ts.
+    def rate(self, ts):
+        with self._lock:
+            return self._rate(ts)
+
+    def _rate(self, ts):
+        hourly = self.profile.rate * self.profile.diurnal[ts % SECONDS_IN_DAY // 3600]
+        return hourly / 60 + sum(per_minute for start, end, per_minute in self._bursts if start <= ts < end)
+
+    # Времена прибытия в [start_ts, end_ts) с точностью до минуты.
+    def arrivals(self, start_ts, end_ts):
+        minutes = range(start_ts, end_ts, 60)
+        with self._lock:
+            self._bursts = [burst for burst in self._bursts if burst[1] > start_ts]
+            rates = [self._rate(ts) for ts in minutes]
+        if np is not None:
+            counts = self.random.np_poisson(rates).tolist()
+        else:
+            counts = [poisson(self.random, lam) for lam in rates]
+        return [ts for ts, count in zip(minutes, counts) for _ in range(count)]
+
+    # Строки пассажиров, прибывающих в [start_ts, end_ts).
+    def passengers(self, start_ts, end_ts):
+        return generate_arrivals(self.arrivals(start_ts, end_ts), self._weights, self.profile.baggage_weight)
+
+
+# Генерация прибытий в модельном времени. Прибытия вставляются окнами на lookahead минут вперёд одной
+# пакетной вставкой, а время первого действия пассажира - минута его прибытия, поэтому тикер забирает
+# пассажиров по мере наступления их минуты, а не всех в одном тике. Следующее окно вставляется, когда
+# от предыдущего остаётся половина. Если модельное время ушло за конец окна (скачок времени табло),
+# пропущенные прибытия не догоняются: иначе они все стали бы наступившими разом.
+class WorkloadRunner:
+    def __init__(self, generator, clock, insert, lookahead=LOOKAHEAD, idle_wait=IDLE_WAIT, horizon=None):
+        self.generator = generator
+        self.clock = clock
+        self.insert = insert  # Вставка строк пассажиров в хранилище.
+        self.lookahead = max(int(lookahead), 1)
+        self.idle_wait = idle_wait
+        self.horizon = horizon  # Модельное время, до которого прибытия уже вставлены.
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name='workload', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    # Вставка прибытий до now_ts + lookahead, если от окна осталась половина. Окно сдвигается
+    # только после успешной вставки: при ошибке те же прибытия вставляются на следующем шаге.
+    # Возвращает модельное время следующего шага.
+    def step(self, now_ts):
+        now_ts -= now_ts % 60
+        if self.horizon is None or self.horizon < now_ts:
+            self.horizon = now_ts
+        refill = (self.lookahead + 1) // 2
+        target = now_ts + self.lookahead * 60
+        if target - self.horizon >= refill * 60:
+            rows = self.generator.passengers(self.horizon, target)
+            if rows:
+                self.insert(rows)
+                metrics.arrivals_total.inc(len(rows))
+            self.horizon = target
+        return self.horizon - (self.lookahead - refill) * 60
+
+    def run(self):
+        while not self._stop.is_set():
+            wait = self.idle_wait
+            now_ts = self.clock.now()
+            if now_ts is not None:
+                try:
+                    delay = self.clock.wall_delay(self.step(now_ts))
+                    if delay is not None:
+                        wait = min(delay, self.idle_wait)
+                except sqlite3.OperationalError:
+                    print(f"{time.strftime('%H:%M:%S', time.localtime())} - Произошла ошибка во время авто-генерации пассажиров.")
+            self._stop.wait(wait)
@@ -92,7 +92,7 @@ def swagger():
                 "post": {
                     "tags": ["Создание пассажиров"],
                     "summary": "Запуск авто-генерации пассажиров",
-                    "description": "Запускает автоматическую генерацию пассажиров с заданными параметрами.",
+                    "description": "Запускает генерацию прибытий пассажиров в модельном времени: пуассоновский поток с суточной кривой интенсивности, всплесками прибытий к рейсам, открытым для покупки билетов, и смесью поведений. Без profile в среднем num_passengers пассажиров прибывают за interval секунд модельного времени. Время первого действия пассажира - минута его прибытия, прибытия вставляются заранее окнами на lookahead минут.",
                     "requestBody": {
                         "required": True,
                         "content": {
@@ -106,7 +106,7 @@ def swagger():
                                         },
                                         "interval": {
                                             "type": "integer",
-                                            "description": "Интервал генерации пассажиров в секундах"
+                                            "description": "Интервал генерации пассажиров в секундах модельного времени"
                                         },
                                         "behavior": {
                                             "type": "string",
@@ -115,6 +115,17 @@ def swagger():
                                         "baggage_weight": {
                                             "type": "integer",
                                             "description": "Вес багажа"
+                                        },
+                                        "profile": {
+                                            "description": "Профиль нагрузки: название ('flat', 'airport') или объект с полями base, rate (прибытий в модельный час), diurnal (24 множителя по часам или 'airport'), behavior_mix ({поведение: вес}), baggage_weight, burst_per_seat, burst_size, burst_window (минуты)",
+                                            "oneOf": [
+                                                {"type": "string"},
+                                                {"type": "object"}
+                                            ]
+                                        },
+                                        "lookahead": {
+                                            "type": "integer",
+                                            "description": "Минуты модельного времени, на которые прибытия вставляются заранее"
                                         }
                                     }
                                 }
@@ -126,7 +137,7 @@ def swagger():
                             "description": "Авто-генерация успешно запущена."
                         },
                         "400": {
-                            "description": "Один из параметров не был заполнен."
+                            "description": "Один из параметров не был заполнен или профиль нагрузки задан неверно."
                         }
                     }
                 }
@@ -172,7 +183,7 @@ def swagger():
                     },
                     "responses": {
                         "200": {
-                            "description": "Покупка билета успешно обработана."
+                            "description": "Пакет обработан одной транзакцией, необработанные записи перечислены в поле failed."
                         },
                         "500": {
                             "description": "Ошибка сервера при покупке билета."
@@ -207,7 +218,7 @@ def swagger():
                     },
                     "responses": {
                         "200": {
-                            "description": "Возврат билета успешно обработан."
+                            "description": "Пакет обработан одной транзакцией, необработанные записи перечислены в поле failed."
                         },
                         "500": {
                             "description": "Ошибка сервера при возврате билета."
@@ -242,7 +253,7 @@ def swagger():
                     },
                     "responses": {
                         "200": {
-                            "description": "Регистрация успешно обработана."
+                            "description": "Пакет обработан одной транзакцией, необработанные записи перечислены в поле failed."
                         },
                         "500": {
                             "description": "Ошибка сервера при регистрации."
@@ -306,7 +317,7 @@ def swagger():
                     },
                     "responses": {
                         "200": {
-                            "description": "Посадка успешно обработана."
+                            "description": "Пакет обработан одной транзакцией, необработанные записи перечислены в поле failed."
                         },
                         "500": {
                             "description": "Ошибка сервера при посадке."
@@ -334,6 +345,14 @@ def swagger():
                                     "airplaneId": {
                                         "type": "string",
                                         "description": "Идентификатор самолета."
+                                    },
+                                    "airplaneType": {
+                                        "type": "string",
+                                        "description": "Тип самолета, по которому определяется вместимость, если не передан capacity."
+                                    },
+                                    "capacity": {
+                                        "type": "integer",
+                                        "description": "Число мест на рейсе. Пассажиры распределяются только на рейсы со свободными местами."
                                     }
                                 },
                                 "required": ["flightId", "airplaneId"]
@@ -344,6 +363,9 @@ def swagger():
                         "200": {
                             "description": "Рейс успешно добавлен и доступен для покупки билетов."
                         },
+                        "400": {
+                            "description": "Вместимость рейса не целое число или отрицательна."
+                        },
                         "500": {
                             "description": "Ошибка сервера при добавлении рейса."
                         }
@@ -415,6 +437,127 @@ def swagger():
                         }
                     }
                 }
+            },
+            "/passenger/time": {
+                "post": {
+                    "tags": ["Взаимодействие с табло"],
+                    "summary": "Передача модельного времени",
+                    "description": "Табло сообщает текущее модельное время (одну отметку или пакет отметок). Пока отметки приходят, модуль не опрашивает табло.",
+                    "requestBody": {
+                        "required": True,
+                        "content": {
+                            "application/json": {
+                                "schema": {
+                                    "oneOf": [
+                                        {
+                                            "type": "string",
+                                            "description": "Модельное время"
+                                        },
+                                        {
+                                            "type": "array",
+                                            "items": {
+                                                "type": "string"
+                                            },
+                                            "description": "Пакет отметок модельного времени в порядке их появления"
+                                        }
+                                    ]
+                                }
+                            }
+                        }
+                    },
+                    "responses": {
+                        "200": {
+                            "description": "Модельное время обновлено."
+                        },
+                        "400": {
+                            "description": "Некорректное модельное время."
+                        }
+                    }
+                }
+            },
+            "/metrics": {
+                "get": {
+                    "tags": ["Мониторинг"],
+                    "summary": "Метрики модуля",
+                    "description": "Метрики в текстовом формате Prometheus: число пассажиров по статусам, смены статусов, длительность тиков, отставание обработки, длительность исходящих запросов и транзакций SQLite, размеры пакетов ответов.",
+                    "responses": {
+                        "200": {
+                            "description": "Текущие значения метрик.",
+                            "content": {
+                                "text/plain": {
+                                    "schema": {
+                                        "type": "string"
+                                    }
+                                }
+                            }
+                        }
+                    }
+                }
+            },
+            "/debug/profile": {
+                "get": {
+                    "tags": ["Мониторинг"],
+                    "summary": "Профилирование горячего пути",
+                    "description": "Последние замеры участков тикера, обработки статусов и обработчиков запросов, а также агрегаты по участкам (число, сумма, максимум, p50, p90, p99 в секундах). Замеры ведутся при PASSENGER_PROFILING=1; PASSENGER_CPROFILE_DIR и PASSENGER_CPROFILE_RATE включают выборочные дампы cProfile.",
+                    "parameters": [
+                        {
+                            "name": "limit",
+                            "in": "query",
+                            "required": False,
+                            "description": "Число последних замеров в отчёте.",
+                            "schema": {
+                                "type": "integer"
+                            }
+                        }
+                    ],
+                    "responses": {
+                        "200": {
+                            "description": "Отчёт профилирования."
+                        }
+                    }
+                }
+            },
+            "/simulation/seed": {
+                "get": {
+                    "tags": ["Создание пассажиров"],
+                    "summary": "Текущее зерно симуляции",
+                    "description": "Возвращает зерно генераторов случайных чисел. null - недетерминированный режим.",
+                    "responses": {
+                        "200": {
+                            "description": "Текущее зерно."
+                        }
+                    }
+                },
+                "post": {
+                    "tags": ["Создание пассажиров"],
+                    "summary": "Задание зерна симуляции",
+                    "description": "Перезапускает потоки случайных чисел подсистем (поведение, багаж, выбор рейсов, вероятностные переходы, времена действий) с заданным зерном. С одинаковым зерном прогоны воспроизводимы. Начальное зерно задаётся переменной окружения PASSENGER_SEED.",
+                    "requestBody": {
+                        "required": True,
+                        "content": {
+                            "application/json": {
+                                "schema": {
+                                    "type": "object",
+                                    "properties": {
+                                        "seed": {
+                                            "type": "integer",
+                                            "nullable": True,
+                                            "description": "Зерно; null - случайное зерно из системного источника"
+                                        }
+                                    }
+                                }
+                            }
+                        }
+                    },
+                    "responses": {
+                        "200": {
+                            "description": "Зерно задано."
+                        },
+                        "400": {
+                            "description": "Зерно должно быть целым числом."
+                        }
+                    }
+                }
             }
         }
     }